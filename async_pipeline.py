@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""End-to-end sentence → video pipeline with rendering overlapped with encoding.
+
+Rendering (`pango_feature_demos`) is CPU-bound in this process while encoding
+runs in ffmpeg child processes.  Here a producer renders job N+1 on a worker
+thread while ffmpeg encodes job N, started with `asyncio.create_subprocess_exec`
+and fed the raw frame over stdin.  Rendered frames wait in a bounded queue, so
+at most ``--queue`` frames are held in memory no matter how long the job list.
+
+Jobs use the same JSONL/CSV format as `batch_render.py`; each job becomes one
+video per selected variant, named `<basename>_<variant><ext>` next to
+`output_video` from the video config.
+
+Usage example:
+  python3 async_pipeline.py --jobs jobs.jsonl --encoders 4 --queue 8
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple
+
+import yaml
+
+import batch_render
+import pango_feature_demos as pfd
+import tracing
+import video_pipeline as vp
+
+
+class Frame(NamedTuple):
+    """A rendered frame waiting to be encoded."""
+
+    cfg: dict
+    data: bytes
+    width: int
+    height: int
+    pix_fmt: str
+
+
+def _render_job(
+    index: int, job: dict, video_cfg: dict, variants: List[pfd.Variant], settings: pfd.Settings
+) -> List[Frame]:
+    """Render every requested variant of *job* (runs on the render thread)."""
+    sentence, phrase = job.get("sentence"), job.get("highlight")
+    if not (sentence and phrase):
+        raise ValueError("job needs both 'sentence' and 'highlight'")
+    basename = Path(job.get("basename") or f"job{index}").stem
+    out_template = Path(video_cfg["output_video"])
+    dirty = pfd.highlight_byte_ranges(sentence, phrase)
+    frames = []
+    for suffix, extra_attrs, color in batch_render.select_variants(job.get("variants"), variants, settings):
+        markup = pfd.variant_markup(sentence, phrase, extra_attrs, color, settings)
+        raster = pfd.render_raster(markup, dirty, settings=settings)
+        output = out_template.with_name(f"{basename}_{suffix}{out_template.suffix or '.webm'}")
+        # The raster aliases the shared session surface – copy before the next render.
+        frames.append(Frame({**video_cfg, "output_video": str(output)}, bytes(raster.data),
+                            raster.width, raster.height, raster.pix_fmt))
+    return frames
+
+
+async def _encode(frame: Frame, force: bool) -> bool:
+    """Encode one frame with ffmpeg; return False when skipped as unchanged."""
+    cfg = frame.cfg
+    cmd, fp, chunks = vp.plan_encode(cfg, frame.data, frame.width, frame.height, frame.pix_fmt)
+    if vp.skip_if_unchanged(cfg, fp, force):
+        return False
+
+    with tracing.span("ffmpeg.run", output=cfg["output_video"]):
+        proc = await asyncio.create_subprocess_exec(*cmd, stdin=asyncio.subprocess.PIPE)
+        assert proc.stdin is not None
+        try:
+            # Frame batches are computed off the event loop so other jobs keep writing.
+            while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+                proc.stdin.write(chunk)
+                await proc.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg exited early; its return code is reported below
+        finally:
+            proc.stdin.close()
+            await proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg exited with {proc.returncode} for {cfg['output_video']}")
+    vp.record_fingerprint(cfg, fp)
+    return True
+
+
+def count_encodes(jobs: List[dict], variants: List[pfd.Variant], settings: pfd.Settings) -> int:
+    """Videos *jobs* produce (one per selected variant), to size the encoder pool."""
+    total = 0
+    for job in jobs:
+        try:
+            total += len(batch_render.select_variants(job.get("variants"), variants, settings))
+        except ValueError:
+            pass  # reported when the job is rendered
+    return total
+
+
+async def run_pipeline(
+    jobs: List[dict],
+    video_cfg: dict,
+    variants: List[pfd.Variant],
+    settings: pfd.Settings,
+    *,
+    encoders: int,
+    queue_size: int,
+    force: bool = False,
+) -> Dict[str, float]:
+    """Render and encode *jobs*; return timing and outcome counters."""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue[Frame | None] = asyncio.Queue(maxsize=queue_size)
+    stats = {"rendered": 0, "encoded": 0, "skipped": 0, "failed": 0, "render_s": 0.0, "encode_s": 0.0}
+
+    async def produce(render_pool: ThreadPoolExecutor) -> None:
+        for index, job in enumerate(jobs):
+            start = time.perf_counter()
+            try:
+                frames = await loop.run_in_executor(render_pool, _render_job, index, job, video_cfg, variants, settings)
+            except Exception as exc:  # noqa: BLE001 – isolate failures per job
+                stats["failed"] += 1
+                print(f"✗ render job {index}: {type(exc).__name__}: {exc}", file=sys.stderr)
+                continue
+            stats["render_s"] += time.perf_counter() - start
+            for frame in frames:
+                stats["rendered"] += 1
+                await queue.put(frame)  # blocks while the encoders are behind
+        for _ in range(encoders):
+            await queue.put(None)
+
+    async def consume() -> None:
+        while (frame := await queue.get()) is not None:
+            start = time.perf_counter()
+            try:
+                encoded = await _encode(frame, force)
+            except Exception as exc:  # noqa: BLE001
+                stats["failed"] += 1
+                print(f"✗ encode {frame.cfg['output_video']}: {exc}", file=sys.stderr)
+                continue
+            seconds = time.perf_counter() - start
+            stats["encode_s"] += seconds
+            stats["encoded" if encoded else "skipped"] += 1
+            print(f"✓ {frame.cfg['output_video']} {seconds:.2f}s (queue {queue.qsize()}/{queue_size})")
+
+    # Single render thread: the pango_feature_demos session is not thread-safe.
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="render") as render_pool:
+        await asyncio.gather(produce(render_pool), *(consume() for _ in range(encoders)))
+    return stats
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--jobs", required=True, help="JSONL or CSV file of render jobs")
+    ap.add_argument("--config", default="config.yml", help="pango_feature_demos YAML config")
+    ap.add_argument("--video-config", default=str(vp.CONFIG_PATH), help="video_pipeline YAML config")
+    ap.add_argument("--encoders", type=int, help="concurrent ffmpeg processes (default: cores / 4)")
+    ap.add_argument("--queue", type=int, default=4, help="rendered frames buffered ahead of the encoders")
+    ap.add_argument("--force", action="store_true", help="encode even if the output is up to date")
+    ap.add_argument("--trace", help="write a Chrome trace of every stage to this JSON file")
+    args = ap.parse_args()
+    if args.trace:
+        tracing.enable()
+
+    render_cfg = pfd.load_config(args.config)
+    with tracing.span("config.load"), open(args.video_config, "r", encoding="utf-8") as f:
+        video_cfg = yaml.safe_load(f)
+    if render_cfg.get("video_config"):
+        render_cfg.update(pfd.video_canvas(video_cfg))  # render at the --video-config size
+    settings = pfd.Settings.from_config(render_cfg)
+    jobs = list(batch_render.read_jobs(Path(args.jobs)))
+    if not jobs:
+        ap.error(f"no jobs found in {args.jobs}")
+
+    variants = pfd.build_variants(render_cfg.get("variants"), settings)
+    encodes = count_encodes(jobs, variants, settings)
+    encoders, threads = vp.plan_threads(max(1, encodes), os.cpu_count() or 1, args.encoders)
+    video_cfg = {**video_cfg, "threads": threads, "loglevel": video_cfg.get("loglevel", "error")}
+
+    start = time.perf_counter()
+    stats = asyncio.run(run_pipeline(
+        jobs, video_cfg, variants, settings,
+        encoders=encoders, queue_size=max(1, args.queue), force=args.force,
+    ))
+    elapsed = time.perf_counter() - start
+    print(
+        f"\n{stats['encoded']} encoded, {stats['skipped']} unchanged, {stats['failed']} failed "
+        f"in {elapsed:.2f}s (render {stats['render_s']:.2f}s, encode {stats['encode_s']:.2f}s "
+        f"across {encoders} encoders × {threads} threads)"
+    )
+    tracing.finish(args.trace)
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
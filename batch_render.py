@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""Render many sentence/highlight jobs in parallel with a process pool.
+
+Jobs are read from a JSONL file (one object per line) or a CSV file with a
+header row.  Each job supports the keys:
+
+  • sentence  – full sentence text (required)
+  • highlight – phrase to highlight (required); in JSONL also a list of
+                phrases, every occurrence of which is highlighted
+  • basename  – output file stem (defaults to ``job<N>``)
+  • variants  – optional; either a list of built-in variant names
+                (``["color", "weight"]``, or ``"color,weight"`` in CSV) or a
+                mapping with the same shape as ``variants`` in config.yml
+
+Every worker process loads the configuration once (gi/cairo import, fontconfig
+scan) and then renders jobs until the queue is drained.  With ``--threads`` the
+jobs are instead rendered by a thread pool inside this one process, sharing the
+resolved settings (Cairo and Pango release the GIL while rasterising).  A
+failing job is reported and skipped; it never takes down the batch.
+
+Usage example:
+  python3 batch_render.py --jobs jobs.jsonl --workers 8
+  python3 batch_render.py --jobs jobs.jsonl --threads 8
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import highlight_core as core
+import pango_feature_demos as pfd
+import tracing
+
+
+def read_jobs(path: Path) -> Iterator[dict]:
+    """Yield job dicts from a ``.jsonl`` or ``.csv`` file."""
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            yield from csv.DictReader(f)
+            return
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path}:{lineno}: invalid JSON ({exc})") from exc
+
+
+def select_variants(
+    spec, default_variants: List[pfd.Variant], settings: core.Settings | None = None
+) -> List[pfd.Variant]:
+    """Resolve a job's ``variants`` field against the configured variant set."""
+    if not spec:
+        return default_variants
+    if isinstance(spec, dict):
+        return pfd.build_variants(spec, settings)
+    if isinstance(spec, str):
+        spec = [name.strip() for name in spec.replace(";", ",").split(",") if name.strip()]
+    by_name = {v[0]: v for v in default_variants}
+    unknown = [name for name in spec if name not in by_name]
+    if unknown:
+        raise ValueError(f"unknown variant(s): {', '.join(unknown)}")
+    return [by_name[name] for name in spec]
+
+
+# ---------------------------------------------------------------------------
+# Worker side – state lives for the lifetime of each pool process.
+
+_VARIANTS: List[pfd.Variant] = []
+
+
+def _init_worker(cfg: dict, trace: bool = False) -> None:
+    global _VARIANTS
+    if trace:
+        tracing.enable()
+    settings = pfd.apply_config(cfg)
+    _VARIANTS = pfd.build_variants(cfg.get("variants"), settings)
+
+
+def _render_job(
+    index: int, job: dict, output_dir: str, settings: core.Settings, variants: List[pfd.Variant]
+) -> Dict[str, object]:
+    start = time.perf_counter()
+    pfd.take_surface_peak()  # reset: this thread's peak now covers this job only
+    basename = Path(job.get("basename") or f"job{index}").stem
+    result: Dict[str, object] = {"index": index, "basename": basename, "outputs": [], "error": None}
+    try:
+        sentence, phrase = job.get("sentence"), job.get("highlight")
+        if not (sentence and phrase):
+            raise ValueError("job needs both 'sentence' and 'highlight'")
+        selected = select_variants(job.get("variants"), variants, settings)
+        outputs = pfd.render_variants(sentence, phrase, selected, Path(output_dir), basename, quiet=True, settings=settings)
+        result["outputs"] = [str(p) for p in outputs]
+    except Exception as exc:  # noqa: BLE001 – isolate failures per job
+        result["error"] = f"{type(exc).__name__}: {exc}"
+    result["seconds"] = time.perf_counter() - start
+    result["peak_surface_bytes"] = pfd.take_surface_peak()
+    return result
+
+
+def _run_job(index: int, job: dict, output_dir: str) -> Dict[str, object]:
+    """Process-pool entry point: render with the worker's settings."""
+    settings = core.SETTINGS
+    cache = settings.render_cache
+    hits, misses = (cache.hits, cache.misses) if cache else (0, 0)
+    result = _render_job(index, job, output_dir, settings, _VARIANTS)
+    if cache:
+        result["cache_hits"] = cache.hits - hits
+        result["cache_misses"] = cache.misses - misses
+    if tracing.TRACER.enabled:
+        result["trace"] = tracing.TRACER.drain()
+    return result
+
+
+# ---------------------------------------------------------------------------
+
+def run_batch(
+    jobs: List[dict], cfg: dict, output_dir: Path, workers: int, *, trace: bool = False
+) -> List[Dict[str, object]]:
+    """Render *jobs* on *workers* processes and return one result per job."""
+    results: List[Dict[str, object]] = []
+    # "spawn" keeps GLib/fontconfig state out of forked children.
+    mp_ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=mp_ctx, initializer=_init_worker, initargs=(cfg, trace)
+    ) as pool:
+        futures = {pool.submit(_run_job, i, job, str(output_dir)): i for i, job in enumerate(jobs)}
+        for fut in as_completed(futures):
+            try:
+                result = fut.result()
+                tracing.TRACER.extend(result.pop("trace", []))  # type: ignore[arg-type]
+                results.append(result)
+            except BrokenProcessPool as exc:
+                # A worker died hard (e.g. a native crash); report the job and carry on
+                # with whatever already completed.
+                i = futures[fut]
+                results.append({"index": i, "basename": jobs[i].get("basename"), "outputs": [],
+                                "error": f"worker crashed: {exc}", "seconds": 0.0})
+    results.sort(key=lambda r: r["index"])  # type: ignore[arg-type,return-value]
+    return results
+
+
+def run_batch_threaded(
+    jobs: List[dict], settings: core.Settings, variants: List[pfd.Variant], output_dir: Path, threads: int
+) -> List[Dict[str, object]]:
+    """Render *jobs* on a pool of *threads* in this process.
+
+    Each thread keeps its own Cairo/Pango session; *settings* is immutable and
+    shared.  Results are returned in job order.
+    """
+    with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="render") as pool:
+        return list(pool.map(
+            lambda ij: _render_job(ij[0], ij[1], str(output_dir), settings, variants), enumerate(jobs)
+        ))
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--jobs", required=True, help="JSONL or CSV file of render jobs")
+    ap.add_argument("--config", default="config.yml", help="YAML configuration file")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes (default: CPU count)")
+    ap.add_argument("--threads", type=int, help="render with this many threads in one process instead of --workers")
+    ap.add_argument("--errors", help="write failed jobs to this JSONL file")
+    ap.add_argument("--trace", help="write a Chrome trace of every stage (all workers) to this JSON file")
+    args = ap.parse_args()
+    if args.trace:
+        tracing.enable()
+
+    cfg = pfd.load_config(args.config)
+    jobs = list(read_jobs(Path(args.jobs)))
+    if not jobs:
+        ap.error(f"no jobs found in {args.jobs}")
+    output_dir = pfd.resolve_output_dir(cfg)
+
+    start = time.perf_counter()
+    if args.threads:
+        settings = pfd.apply_config(cfg)
+        variants = pfd.build_variants(cfg.get("variants"), settings)
+        results = run_batch_threaded(jobs, settings, variants, output_dir, max(1, args.threads))
+    else:
+        settings = None
+        results = run_batch(jobs, cfg, output_dir, max(1, args.workers), trace=bool(args.trace))
+    elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if r["error"]]
+    images = sum(len(r["outputs"]) for r in results)  # type: ignore[arg-type]
+    for r in failed:
+        print(f"✗ job {r['index']} ({r['basename']}): {r['error']}", file=sys.stderr)
+    if failed and args.errors:
+        with open(args.errors, "w", encoding="utf-8") as f:
+            for r in failed:
+                f.write(json.dumps({**jobs[r["index"]], "error": r["error"]}) + "\n")  # type: ignore[index]
+
+    rate = images / elapsed if elapsed > 0 else 0.0
+    print(
+        f"\n{len(results) - len(failed)}/{len(results)} jobs ok, {images} images "
+        f"in {elapsed:.2f}s ({rate:.1f} images/sec, "
+        f"{f'{args.threads} threads' if args.threads else f'{args.workers} workers'}) → {output_dir}"
+    )
+    peaks = [r["peak_surface_bytes"] for r in results if r.get("peak_surface_bytes")]
+    if peaks:
+        mib = 2**20
+        print(f"Peak surface memory per job: max {max(peaks) / mib:.1f} MiB, "  # type: ignore[type-var,operator]
+              f"mean {sum(peaks) / len(peaks) / mib:.1f} MiB")  # type: ignore[arg-type]
+    if settings is not None and settings.render_cache is not None:
+        print("Render cache:", ", ".join(f"{k}={v}" for k, v in settings.render_cache.stats().items()))
+    elif cfg.get("cache_dir"):
+        hits = sum(r.get("cache_hits", 0) for r in results)  # type: ignore[misc]
+        misses = sum(r.get("cache_misses", 0) for r in results)  # type: ignore[misc]
+        print(f"Render cache: hits={hits}, misses={misses}")
+    tracing.finish(args.trace)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
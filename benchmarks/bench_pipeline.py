@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Per-stage benchmarks for the text → PNG → video pipeline.
+
+Times each stage separately so a change can be attributed to the stage it
+actually affects:
+
+  • markup     – `make_markup`
+  • layout     – `set_markup` + `get_pixel_extents` on a warm layout
+  • raster     – clear + `PangoCairo.show_layout` of an already laid-out
+                 layout onto the session surface
+  • png        – `write_to_png` of the rendered surface (Cairo's zlib default)
+  • png1       – `image_io.write_png` at zlib level 1 (needs NumPy)
+  • raw        – `image_io.write_raw`, the uncompressed hand-off format
+  • encode     – end-to-end `video_pipeline` encode of that PNG (needs ffmpeg)
+  • startup    – fresh-interpreter import of `highlight_core`,
+                 `pango_feature_demos` and the lazily loaded Cairo/Pango backend
+
+across short/long sentences, 1080p/4K canvases and every built-in variant.
+Results are written as JSON; pass a previous result file as ``--baseline`` to
+flag stages whose median got slower than ``--threshold``.
+
+Usage example:
+  python3 benchmarks/bench_pipeline.py --output bench.json
+  python3 benchmarks/bench_pipeline.py --baseline bench.json --threshold 0.1
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import highlight_core as core  # noqa: E402
+import image_io  # noqa: E402
+import pango_feature_demos as pfd  # noqa: E402
+import video_pipeline as vp  # noqa: E402
+
+SENTENCES = {
+    "short": ("Growth comes from stepping out of the comfort zone.", "comfort zone"),
+    "long": (
+        "Sarah finally saw the light at the end of the tunnel, after months of hard work on this "
+        "challenging project, countless late nights, two failed prototypes and one very patient "
+        "team that kept believing the idea would eventually work out in the end.",
+        "the light at the end of the tunnel",
+    ),
+}
+CANVASES = {"1080p": (1920, 1080), "4k": (3840, 2160)}
+
+
+def timeit(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run *fn* once to warm up, then *repeat* times; return timing stats (s)."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(samples), "min_s": min(samples), "runs": repeat}
+
+
+STARTUP_SNIPPETS = {
+    "core": "import highlight_core",
+    "cli": "import pango_feature_demos",
+    "backend": "import pango_feature_demos as p; p._load_backend()",
+}
+
+
+def startup_benchmarks(repeat: int) -> Dict[str, Dict[str, float]]:
+    """Time cold imports in fresh interpreters, as short-lived workers see them."""
+    results = {}
+    for name, snippet in STARTUP_SNIPPETS.items():
+        cmd = [sys.executable, "-c", snippet]
+        results[f"startup/{name}"] = timeit(lambda: subprocess.run(cmd, check=True, cwd=ROOT), repeat)
+    return results
+
+
+def run_benchmarks(repeat: int, encode: bool) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = startup_benchmarks(repeat)
+    try:
+        import numpy  # noqa: F401
+        have_numpy = True
+    except ImportError:
+        have_numpy = False
+    tmp = Path(tempfile.mkdtemp(prefix="bench_"))
+    try:
+        for canvas_name, (width, height) in CANVASES.items():
+            settings = core.Settings(canvas_width=width, canvas_height=height)
+            session = pfd.get_session(width, height)
+            for text_name, (sentence, phrase) in SENTENCES.items():
+                for suffix, extra_attrs, color in pfd.build_variants(settings=settings):
+                    name = f"{canvas_name}/{text_name}/{suffix}"
+
+                    def markup_stage() -> str:
+                        return pfd.make_markup(
+                            sentence, phrase, extra_attrs=extra_attrs, highlight_color=color, settings=settings
+                        )
+
+                    markup = markup_stage()
+
+                    def layout_stage() -> None:
+                        session.layout.set_width(settings.wrap_width * pfd.Pango.SCALE)
+                        session.layout.set_markup(markup, -1)
+                        session.layout.get_pixel_extents()
+
+                    def raster_stage() -> None:
+                        session._clear(settings.background_rgba)
+                        session.ctx.translate(origin_x, origin_y)
+                        pfd.PangoCairo.show_layout(session.ctx, session.layout)
+                        session.surface.flush()
+
+                    png = tmp / f"{canvas_name}_{text_name}_{suffix}.png"
+
+                    def png_stage() -> None:
+                        session.surface.write_to_png(str(png))
+
+                    results[f"markup/{name}"] = timeit(markup_stage, repeat * 10)
+                    results[f"layout/{name}"] = timeit(layout_stage, repeat)
+                    # Lay the markup out once so the raster stage times only drawing.
+                    origin_x, origin_y, _ = session._layout(markup, settings.wrap_width)
+                    results[f"raster/{name}"] = timeit(raster_stage, repeat)
+                    results[f"png/{name}"] = timeit(png_stage, repeat)
+
+                    surface = session.surface
+                    args = (surface.get_data(), surface.get_width(), surface.get_height(), surface.get_stride())
+                    if have_numpy:
+                        results[f"png1/{name}"] = timeit(lambda: image_io.write_png(png, *args, 1), repeat)
+                    results[f"raw/{name}"] = timeit(lambda: image_io.write_raw(png.with_suffix(".raw"), *args), repeat)
+
+            if encode:
+                png = tmp / f"{canvas_name}_short_color.png"
+                cfg = {
+                    "png_path": str(png),
+                    "output_video": str(tmp / f"{canvas_name}.webm"),
+                    "width": width,
+                    "height": height,
+                    "fps": 30,
+                    "total_duration": 2,
+                    "fade_in_duration": 0.5,
+                    "fade_out_duration": 0.5,
+                    "codec": "vp9alpha",
+                    "loglevel": "error",
+                }
+                cmd = vp.build_ffmpeg_command(cfg)
+                results[f"encode/{canvas_name}/short/color"] = timeit(
+                    lambda: subprocess.run(cmd, check=True), max(1, repeat // 5)
+                )
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Names of benchmarks whose median regressed by more than *threshold*."""
+    regressions = []
+    for name, stats in sorted(results.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = stats["median_s"] / base["median_s"] if base["median_s"] else 1.0
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{name}: {base['median_s']*1e3:.3f} ms → {stats['median_s']*1e3:.3f} ms ({ratio:.2f}×)")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--output", default="bench_output.json", help="where to write the results JSON")
+    ap.add_argument("--baseline", help="previous results JSON to compare against")
+    ap.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown ratio (0.15 = 15%%)")
+    ap.add_argument("--repeat", type=int, default=10, help="timed runs per benchmark")
+    ap.add_argument("--no-encode", action="store_true", help="skip the ffmpeg encode stage")
+    args = ap.parse_args()
+
+    encode = not args.no_encode and shutil.which("ffmpeg") is not None
+    results = run_benchmarks(args.repeat, encode)
+    payload = {
+        "machine": {"python": platform.python_version(), "platform": platform.platform()},
+        "results": results,
+    }
+    Path(args.output).write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+    for name, stats in sorted(results.items()):
+        print(f"{name:<40} {stats['median_s']*1e3:9.3f} ms (min {stats['min_s']*1e3:.3f})")
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))["results"]
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n⚠️ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print("  " + line)
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Python-side fade frame generator with real easing curves.
+
+FFmpeg's `fade` filter is linear only, so `easing_in` / `easing_out` in
+`config_video.yml` have no effect on the ffmpeg backend.  This backend takes the
+rendered premultiplied ARGB32 buffer once, precomputes one 256-entry byte LUT
+per fading frame (using the same sine curves as `manim_fade_scene.py`) and
+streams the scaled frames to ffmpeg as rawvideo.
+
+Because Cairo buffers are premultiplied, fading is simply scaling every
+channel by the frame's opacity, which the LUT does in a single gather per
+byte.  Hold frames are the untouched buffer and cost nothing to produce.
+
+Select it with `backend: frames` in `config_video.yml`.  Requires NumPy.
+"""
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List
+
+# Same curves as manim's linear / ease_{in,out,in_out}_sine, which
+# manim_fade_scene.EASING_TO_RATE_FUNC maps these names to.
+EASING_FUNCS: Dict[str, Callable[[float], float]] = {
+    "linear": lambda t: t,
+    "easein": lambda t: 1 - math.cos(t * math.pi / 2),
+    "easeout": lambda t: math.sin(t * math.pi / 2),
+    "easeinout": lambda t: -(math.cos(math.pi * t) - 1) / 2,
+}
+
+
+def alpha_schedule(cfg: dict) -> List[float]:
+    """Per-frame opacity (0-1) for the whole clip described by *cfg*.
+
+    The fade-in starts fully transparent and the final frame is fully
+    transparent again, matching the Manim scene.
+    """
+    fps = cfg.get("fps", 30)
+    total = max(1, round(cfg.get("total_duration", 10) * fps))
+    n_in = min(total, round(cfg.get("fade_in_duration", 1.5) * fps))
+    n_out = min(total - n_in, round(cfg.get("fade_out_duration", 1.5) * fps))
+    rate_in = EASING_FUNCS.get(str(cfg.get("easing_in", "linear")).lower(), EASING_FUNCS["linear"])
+    rate_out = EASING_FUNCS.get(str(cfg.get("easing_out", "linear")).lower(), EASING_FUNCS["linear"])
+
+    alphas = [rate_in(i / n_in) for i in range(n_in)]
+    alphas += [1.0] * (total - n_in - n_out)
+    alphas += [1.0 - rate_out((k + 1) / n_out) for k in range(n_out)]
+    return alphas
+
+
+def iter_frames(data, alphas: List[float], batch_size: int = 8) -> Iterator[memoryview]:
+    """Yield one premultiplied frame per entry in *alphas*.
+
+    Fading frames are produced *batch_size* at a time with a single
+    vectorised LUT gather; fully opaque frames reuse *data* as-is.
+    """
+    try:
+        import numpy as np
+    except ImportError as exc:  # pragma: no cover
+        raise RuntimeError("the 'frames' backend requires NumPy (pip install numpy)") from exc
+
+    src = np.frombuffer(data, dtype=np.uint8)
+    opaque = memoryview(data).cast("B")
+    levels = np.arange(256, dtype=np.float32)
+
+    i = 0
+    while i < len(alphas):
+        if alphas[i] >= 1.0:
+            yield opaque
+            i += 1
+            continue
+        j = i
+        while j < len(alphas) and j - i < batch_size and alphas[j] < 1.0:
+            j += 1
+        luts = np.rint(levels[None, :] * np.asarray(alphas[i:j], dtype=np.float32)[:, None]).astype(np.uint8)
+        batch = luts[np.arange(j - i)[:, None], src[None, :]]
+        for frame in batch:
+            yield memoryview(frame)
+        i = j
+
+
+def load_png_raster(png_path: Path, placement: dict | None = None):
+    """Load a PNG as a premultiplied ARGB32 buffer; return ``(data, width, height)``.
+
+    `.raw` frames (`output_format: raw`) are already in that layout and are
+    read without decoding.  Cropped renders (see `video_pipeline.load_placement`)
+    are composited back onto their full canvas first.
+    """
+    import image_io
+
+    raw = image_io.load_raw_meta(png_path)
+    if raw and not placement:
+        return png_path.read_bytes(), int(raw["width"]), int(raw["height"])
+
+    import cairo  # type: ignore
+
+    if raw:
+        width = int(raw["width"])
+        image = cairo.ImageSurface.create_for_data(
+            bytearray(png_path.read_bytes()), cairo.FORMAT_ARGB32, width, int(raw["height"]), width * 4
+        )
+    else:
+        image = cairo.ImageSurface.create_from_png(str(png_path))
+    if placement:
+        canvas = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, int(placement["canvas_width"]), int(placement["canvas_height"])
+        )
+        ctx = cairo.Context(canvas)
+        ctx.set_source_rgba(*placement.get("background_rgba", (0.0, 0.0, 0.0, 0.0)))
+        ctx.paint()
+        if "atlas_rect" in placement:  # variant atlas: copy just this variant
+            ax, ay, aw, ah = placement["atlas_rect"]
+            ctx.rectangle(placement["x"], placement["y"], aw, ah)
+            ctx.clip()
+            ctx.set_source_surface(image, placement["x"] - ax, placement["y"] - ay)
+        else:
+            ctx.set_source_surface(image, placement["x"], placement["y"])
+        ctx.paint()
+        image = canvas
+    image.flush()
+    return image.get_data(), image.get_width(), image.get_height()
+
@@ -0,0 +1,384 @@
+"""Lightweight core of the highlight renderer: settings, colours and markup.
+
+Everything here is pure Python – no Cairo, PyGObject or Pango – so importing it
+is cheap.  Use it from short-lived workers and tests that only need colour
+conversion, `make_markup` or config parsing.  `pango_feature_demos` builds on
+this module and loads the Cairo/Pango backend only when something is actually
+rendered.
+
+Configuration is resolved once into an immutable `Settings` object that the
+render functions take explicitly.  `SETTINGS` is the process-wide default used
+when none is passed; the CLIs replace it with `apply_config`.
+"""
+from __future__ import annotations
+
+import colorsys
+import functools
+from dataclasses import dataclass, field
+from datetime import datetime
+from html import escape
+from pathlib import Path
+from typing import Dict, List, Mapping, Tuple
+
+from phrase_matcher import PhraseMatcher
+from render_cache import RenderCache
+from tracing import span
+
+# ---------------------------------------------------------------------------
+
+def rgb_to_hex(rgb: Tuple[float, float, float]) -> str:
+    return "#" + "".join(f"{int(c*255):02x}" for c in rgb)
+
+
+def hsla_to_rgba(hsla: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+    """Convert HSLA (0-1 range) to RGBA.
+
+    HSLA = hue, saturation, lightness, alpha.  We use colorsys.hls_to_rgb
+    which expects hue, lightness, saturation.
+    """
+    h, s, l, a = hsla
+    r, g, b = colorsys.hls_to_rgb(h, l, s)
+    return (r, g, b, a)
+
+
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Resolved renderer configuration (see `config.yml`).
+
+    Build one with :meth:`from_config` and pass it to the render functions.
+    Instances are immutable, so a single one can be shared by any number of
+    threads and differently configured jobs can render side by side in one
+    process.
+    """
+
+    canvas_width: int = 1920
+    canvas_height: int = 1080
+    wrap_ratio: float = 0.85
+    # RGBA for background (alpha allows transparency)
+    background_rgba: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+    text_color: Tuple[float, float, float] = (1.0, 1.0, 1.0)
+    default_highlight_color: Tuple[float, float, float] = (0.5, 1.0, 1.0)
+    base_font_family: str = "Arial"
+    base_font_size_pt: float = 50
+    color_variant_color: Tuple[float, float, float] = (0.0, 0.6, 1.0)
+    size_variant_factor: float = 1.4
+    family_variant_font: str = "Courier New"
+    weight_variant_weight: str = "bold"
+    style_variant_style: str = "italic"
+    underline_variant_underline: str = "single"
+    strike_variant_strikethrough: str = "true"
+    rise_variant_rise: int = 10000
+    # Tight-bounding-box output: write only the text rectangle plus a JSON sidecar
+    crop_output: bool = False
+    crop_padding: int = 8
+    # Image written by `render`: "png" (deliverable) or "raw" (premultiplied
+    # rawvideo frame for ffmpeg, see image_io.py).  png_compression None keeps
+    # Cairo's default zlib settings; 0-9 selects an explicit level.
+    output_format: str = "png"
+    png_compression: int | None = None
+    # Pagination: text taller than the canvas is split at line boundaries into
+    # <name>_p001.png, <name>_p002.png, … with page_margin pixels top and bottom.
+    paginate: bool = False
+    page_margin: int = 60
+    # Redraw only the highlighted lines of variants whose line metrics match the
+    # first variant rendered for the same text (full-canvas renders only)
+    incremental_variants: bool = True
+    # Atlas: pack every variant's crop into one <name>_atlas image + JSON index
+    atlas_output: bool = False
+    # Cairo surface memory allowed per render (MiB).  A canvas that needs more
+    # is rasterised in horizontal strips streamed to the image file; None → off
+    memory_budget_mb: float | None = None
+    # Content-addressed PNG cache (None → disabled); see render_cache.py
+    render_cache: RenderCache | None = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.output_format not in ("png", "raw"):
+            raise ValueError(f"output_format must be 'png' or 'raw', not {self.output_format!r}")
+        if self.png_compression is not None and not 0 <= self.png_compression <= 9:
+            raise ValueError("png_compression must be between 0 and 9 (or null)")
+        if self.atlas_output and self.paginate:
+            raise ValueError("atlas_output and paginate cannot be combined")
+        if self.memory_budget_mb is not None and self.memory_budget_mb <= 0:
+            raise ValueError("memory_budget_mb must be positive (or null)")
+
+    @property
+    def wrap_width(self) -> int:
+        return int(self.canvas_width * self.wrap_ratio)
+
+    @classmethod
+    def from_config(cls, cfg: dict, base: Settings | None = None) -> Settings:
+        """Resolve a parsed `config.yml` on top of *base* (default: defaults)."""
+        base = base or cls()
+
+        # --- Background colour ----------------------------------------------
+        background = base.background_rgba
+        if "background_color_hsla" in cfg:
+            background = hsla_to_rgba(tuple(cfg["background_color_hsla"]))  # type: ignore[arg-type]
+        elif "background_color" in cfg:
+            # legacy RGB without alpha → opaque background
+            rgb = cfg["background_color"]
+            background = (rgb[0], rgb[1], rgb[2], 1.0)
+
+        # --- Text colour ----------------------------------------------------
+        if "text_color_hsla" in cfg:
+            text_color = hsla_to_rgba(tuple(cfg["text_color_hsla"]))[:3]  # strip alpha → RGB
+        else:
+            text_color = tuple(cfg.get("text_color", base.text_color))
+
+        # --- Highlight colour -----------------------------------------------
+        if "default_highlight_color_hsla" in cfg:
+            highlight = hsla_to_rgba(tuple(cfg["default_highlight_color_hsla"]))[:3]
+        else:
+            highlight = tuple(cfg.get("default_highlight_color", base.default_highlight_color))
+
+        cache = None
+        if cfg.get("cache_dir"):
+            cache = RenderCache(cfg["cache_dir"], int(cfg.get("cache_max_mb", 1024) * 1024 * 1024))
+        compression = cfg.get("png_compression", base.png_compression)
+        budget = cfg.get("memory_budget_mb", base.memory_budget_mb)
+
+        return cls(
+            canvas_width=int(cfg.get("canvas_width", base.canvas_width)),
+            canvas_height=int(cfg.get("canvas_height", base.canvas_height)),
+            wrap_ratio=float(cfg.get("wrap_ratio", base.wrap_ratio)),
+            background_rgba=tuple(background),  # type: ignore[arg-type]
+            text_color=text_color,  # type: ignore[arg-type]
+            default_highlight_color=highlight,  # type: ignore[arg-type]
+            base_font_family=cfg.get("base_font_family", base.base_font_family),
+            base_font_size_pt=cfg.get("base_font_size_pt", base.base_font_size_pt),
+            color_variant_color=tuple(cfg.get("color_variant_color", base.color_variant_color)),  # type: ignore[arg-type]
+            size_variant_factor=cfg.get("size_variant_factor", base.size_variant_factor),
+            family_variant_font=cfg.get("family_variant_font_family", base.family_variant_font),
+            weight_variant_weight=cfg.get("weight_variant_weight", base.weight_variant_weight),
+            style_variant_style=cfg.get("style_variant_style", base.style_variant_style),
+            underline_variant_underline=cfg.get("underline_variant_underline", base.underline_variant_underline),
+            strike_variant_strikethrough=cfg.get("strike_variant_strikethrough", base.strike_variant_strikethrough),
+            rise_variant_rise=cfg.get("rise_variant_rise", base.rise_variant_rise),
+            crop_output=bool(cfg.get("crop_output", base.crop_output)),
+            crop_padding=int(cfg.get("crop_padding", base.crop_padding)),
+            output_format=str(cfg.get("output_format", base.output_format)).lower(),
+            png_compression=None if compression is None else int(compression),
+            paginate=bool(cfg.get("paginate", base.paginate)),
+            page_margin=int(cfg.get("page_margin", base.page_margin)),
+            incremental_variants=bool(cfg.get("incremental_variants", base.incremental_variants)),
+            atlas_output=bool(cfg.get("atlas_output", base.atlas_output)),
+            memory_budget_mb=None if budget is None else float(budget),
+            render_cache=cache,
+        )
+
+
+def make_markup(
+    sentence: str,
+    phrase: str,
+    *,
+    extra_attrs: Dict[str, str] | None = None,
+    highlight_color: Tuple[float, float, float] | None = None,
+    font_size_pt: float | None = None,
+    settings: Settings | None = None,
+) -> str:
+    settings = settings or SETTINGS
+    if phrase not in sentence:
+        raise ValueError("highlight phrase not found in sentence")
+
+    start = sentence.index(phrase)
+    end = start + len(phrase)
+
+
+
+    if highlight_color is None:
+        highlight_color = settings.default_highlight_color
+    if font_size_pt is None:
+        font_size_pt = settings.base_font_size_pt
+
+    base_span_open = _base_span_open(settings, font_size_pt)
+
+    attrs = {
+        "foreground": rgb_to_hex(highlight_color),
+    }
+    if extra_attrs:
+        attrs.update(extra_attrs)
+
+    attrs_str = " ".join(f"{k}='{v}'" for k, v in attrs.items())
+    highlight_open = f"<span {attrs_str}>"
+
+    return (
+        base_span_open
+        + escape(sentence[:start])
+        + highlight_open
+        + escape(phrase)
+        + "</span>"  # close highlight
+        + escape(sentence[end:])
+        + "</span>"  # close base
+    )
+
+
+def _base_span_open(settings: Settings, font_size_pt: float) -> str:
+    return (
+        f"<span font_family='{settings.base_font_family}' size='{int(font_size_pt*1024)}' "
+        f"foreground='{rgb_to_hex(settings.text_color)}'>"
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _matcher(phrases: Tuple[str, ...], whole_words: bool) -> PhraseMatcher:
+    return PhraseMatcher(phrases, whole_words=whole_words)
+
+
+def make_multi_markup(
+    sentence: str,
+    highlights: Mapping[str, Dict[str, str] | None],
+    *,
+    highlight_color: Tuple[float, float, float] | None = None,
+    font_size_pt: float | None = None,
+    whole_words: bool = False,
+    settings: Settings | None = None,
+) -> str:
+    """Markup highlighting every occurrence of every phrase in *highlights*.
+
+    *highlights* maps each phrase to its own extra span attributes (on top of
+    the *highlight_color* foreground).  All phrases are found in one pass of a
+    `PhraseMatcher`; overlapping occurrences resolve leftmost-longest.  Phrases
+    that do not occur are ignored.
+    """
+    settings = settings or SETTINGS
+    if highlight_color is None:
+        highlight_color = settings.default_highlight_color
+    if font_size_pt is None:
+        font_size_pt = settings.base_font_size_pt
+
+    phrases = tuple(highlights)
+    opens = []
+    for phrase in phrases:
+        attrs = {"foreground": rgb_to_hex(highlight_color), **(highlights[phrase] or {})}
+        opens.append("<span " + " ".join(f"{k}='{v}'" for k, v in attrs.items()) + ">")
+
+    parts = [_base_span_open(settings, font_size_pt)]
+    pos = 0
+    for match in _matcher(phrases, whole_words).find(sentence) if phrases else []:
+        parts += [escape(sentence[pos:match.start]), opens[match.index], escape(sentence[match.start:match.end]), "</span>"]
+        pos = match.end
+    parts += [escape(sentence[pos:]), "</span>"]
+    return "".join(parts)
+
+
+def variant_markup(
+    sentence: str,
+    phrase: str | List[str],
+    extra_attrs: Dict[str, str],
+    highlight_color: Tuple[float, float, float],
+    settings: Settings | None = None,
+) -> str:
+    """Markup for one variant: *phrase* is a single phrase (first occurrence,
+    via `make_markup`) or a list whose every occurrence gets *extra_attrs*."""
+    if isinstance(phrase, str):
+        return make_markup(sentence, phrase, extra_attrs=extra_attrs, highlight_color=highlight_color, settings=settings)
+    return make_multi_markup(
+        sentence, {p: extra_attrs for p in phrase}, highlight_color=highlight_color, settings=settings
+    )
+
+
+def highlight_byte_ranges(sentence: str, phrase: str | List[str]) -> List[Tuple[int, int]]:
+    """UTF-8 byte ranges of *sentence* that `variant_markup` styles.
+
+    Pango reports layout lines in byte offsets of the text, which for this
+    markup is exactly *sentence*.
+    """
+    if isinstance(phrase, str):
+        start = sentence.find(phrase)
+        spans = [(start, start + len(phrase))] if start >= 0 else []
+    else:
+        spans = [(m.start, m.end) for m in _matcher(tuple(phrase), False).find(sentence)] if phrase else []
+    return [(len(sentence[:a].encode("utf-8")), len(sentence[:b].encode("utf-8"))) for a, b in spans]
+
+
+# ---------------------------------------------------------------------------
+
+def video_canvas(video_cfg: dict) -> Dict[str, int]:
+    """`canvas_width`/`canvas_height` matching a video config's output size.
+
+    With a rendition ladder this is the largest rendition, which every other
+    rendition is scaled down from.
+    """
+    base = {k: v for k, v in video_cfg.items() if k != "renditions"}
+    sizes = [
+        (int(r.get("width") or 0), int(r.get("height") or 0))
+        for r in ({**base, **entry} for entry in (video_cfg.get("renditions") or [base]))
+    ]
+    width, height = max(sizes, key=lambda wh: wh[0] * wh[1])
+    return {"canvas_width": width, "canvas_height": height} if width and height else {}
+
+
+def load_config(path: str | Path) -> dict:
+    """Read the YAML config at *path*; a missing file yields an empty dict.
+
+    When the config names a `video_config` (relative to *path*), the canvas
+    size is taken from that video config so frames are rendered at video
+    resolution.
+    """
+    cfg_path = Path(path)
+    if not cfg_path.exists():
+        return {}
+    import yaml  # deferred: only needed when a config file is actually read
+
+    with span("config.load"), cfg_path.open() as f:
+        cfg = yaml.safe_load(f) or {}
+    video_path = cfg_path.parent / cfg["video_config"] if cfg.get("video_config") else None
+    if video_path is not None and video_path.exists():
+        with span("config.load"), video_path.open() as f:
+            cfg.update(video_canvas(yaml.safe_load(f) or {}))
+    return cfg
+
+
+def apply_config(cfg: dict) -> Settings:
+    """Resolve *cfg* over the current defaults and make it the process-wide
+    `SETTINGS`; returns the new settings."""
+    global SETTINGS
+    SETTINGS = Settings.from_config(cfg, SETTINGS)
+    return SETTINGS
+
+
+def resolve_output_dir(cfg: dict) -> Path:
+    """Create and return the output directory described by *cfg*."""
+    output_root = Path(cfg.get("output_dir", "output"))
+    mode = cfg.get("output_dir_mode", "timestamped")
+    if mode == "timestamped":
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        output_dir = output_root / timestamp
+    else:
+        output_dir = output_root
+    output_dir.mkdir(parents=True, exist_ok=True)
+    return output_dir
+
+
+Variant = Tuple[str, Dict[str, str], Tuple[float, float, float]]
+
+
+def build_variants(variants_cfg: dict | None = None, settings: Settings | None = None) -> List[Variant]:
+    """Return ``(suffix, extra_attrs, highlight_color)`` tuples to render.
+
+    *variants_cfg* has the shape of the ``variants`` mapping in config.yml; when
+    empty the eight built-in feature demos are used.
+    """
+    s = settings or SETTINGS
+    highlight = s.default_highlight_color
+    if variants_cfg:
+        variants = []
+        for suffix, detail in variants_cfg.items():
+            detail = detail or {}
+            extra_attrs = detail.get("extra_attrs", {})
+            color = tuple(detail.get("highlight_color", highlight))  # type: ignore[arg-type]
+            variants.append((suffix, extra_attrs, color))
+        return variants
+    return [
+        ("color", {}, s.color_variant_color),
+        ("size", {"size": str(int(s.base_font_size_pt * s.size_variant_factor * 1024))}, highlight),
+        ("family", {"font_family": s.family_variant_font}, highlight),
+        ("weight", {"weight": s.weight_variant_weight}, highlight),
+        ("style", {"style": s.style_variant_style}, highlight),
+        ("underline", {"underline": s.underline_variant_underline}, highlight),
+        ("strike", {"strikethrough": s.strike_variant_strikethrough}, highlight),
+        ("rise", {"rise": str(s.rise_variant_rise)}, highlight),
+    ]
+
+
+SETTINGS = Settings()
@@ -0,0 +1,237 @@
+"""Intermediate image writers for the render → ffmpeg hand-off.
+
+Cairo's `write_to_png` always compresses with zlib's default settings, which
+is a large share of `render()` time for a full-canvas frame that ffmpeg reads
+once and discards.  This module offers two cheaper hand-off formats:
+
+  • `write_png`  – straight-alpha RGBA PNG at an explicit zlib level
+                   (0 = stored, 1 = fastest … 9 = smallest)
+  • `write_raw`  – the premultiplied Cairo buffer as-is (`.raw`), described by a
+                   `<name>.json` sidecar that `video_pipeline` feeds to ffmpeg's
+                   rawvideo demuxer
+
+Both take Cairo ARGB32 memory (``data``, ``width``, ``height``, ``stride``).
+`write_png` needs NumPy for the unpremultiply step; `write_raw` does not.
+
+`PngStream` and `RawStream` write the same files strip by strip, so an image
+never has to exist in memory as a whole (tiled rendering, `memory_budget_mb`).
+"""
+from __future__ import annotations
+
+import json
+import os
+import struct
+import sys
+import threading
+import zlib
+from pathlib import Path
+from typing import Dict, Tuple
+
+# Cairo's native-endian ARGB32 as an FFmpeg pixel format
+RAW_PIX_FMT = "bgra" if sys.byteorder == "little" else "argb"
+RAW_SUFFIX = ".raw"
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+DEFAULT_PNG_LEVEL = 6  # zlib's (and so Cairo's) default
+# Peak bytes per pixel of PNG encoding relative to the 4-byte ARGB32 input:
+# `unpremultiply_rgba` holds uint32 channel copies plus the RGBA output.
+PNG_SCRATCH_FACTOR = 6
+
+
+def _chunk(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def unpremultiply_rgba(data, width: int, height: int, stride: int, x: int = 0) -> bytes:
+    """Convert premultiplied ARGB32 memory to straight-alpha RGBA rows.
+
+    Only columns ``x`` to ``x + width`` of each row are converted.
+    """
+    try:
+        import numpy as np
+    except ImportError as exc:  # pragma: no cover
+        raise RuntimeError("PNG encoding with png_compression or memory_budget_mb requires NumPy (pip install numpy)") from exc
+
+    rows = np.frombuffer(data, dtype=np.uint8, count=height * stride).reshape(height, stride)
+    px = rows[:, x * 4:(x + width) * 4].reshape(height, width, 4)
+    if sys.byteorder == "little":
+        b, g, r, a = (px[..., i].astype(np.uint32) for i in range(4))
+    else:
+        a, r, g, b = (px[..., i].astype(np.uint32) for i in range(4))
+    safe_a = np.maximum(a, 1)
+    out = np.empty((height, width, 4), dtype=np.uint8)
+    for i, c in enumerate((r, g, b)):
+        # Same rounding as Cairo's own PNG writer.
+        out[..., i] = np.where(a == 0, 0, np.minimum((c * 255 + a // 2) // safe_a, 255))
+    out[..., 3] = a
+    return out.tobytes()
+
+
+def encode_png(data, width: int, height: int, stride: int, level: int) -> bytes:
+    """RGBA PNG bytes of the premultiplied buffer at zlib *level* (0-9)."""
+    rgba = unpremultiply_rgba(data, width, height, stride)
+    row = width * 4
+    # Filter type 0 (None) per scanline: cheap, and at low levels the filter
+    # search zlib would benefit from costs more than it saves.
+    raw = b"".join(b"\x00" + rgba[y * row:(y + 1) * row] for y in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"".join((
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", ihdr),
+        _chunk(b"IDAT", zlib.compress(raw, level)),
+        _chunk(b"IEND", b""),
+    ))
+
+
+def write_png(path: Path, data, width: int, height: int, stride: int, level: int) -> None:
+    """Write an RGBA PNG of the premultiplied buffer with zlib *level* (0-9)."""
+    with open(path, "wb") as f:
+        f.write(encode_png(data, width, height, stride, level))
+
+
+def write_raw(path: Path, data, width: int, height: int, stride: int) -> Dict[str, object]:
+    """Write the premultiplied buffer to *path*; return its sidecar metadata.
+
+    Row padding beyond ``width * 4`` bytes is dropped so the file is a plain
+    rawvideo frame.
+    """
+    row = width * 4
+    view = memoryview(data).cast("B")
+    with open(path, "wb") as f:
+        if stride == row:
+            f.write(view[: row * height])
+        else:
+            for y in range(height):
+                f.write(view[y * stride:y * stride + row])
+    return raw_meta(width, height)
+
+
+class _StripFile:
+    """Strip-written image file that only appears at *path* once complete.
+
+    Rows go to a temporary file next to *path*, renamed over it by `close`
+    when all *height* rows arrived; `abort` (or an exception inside a
+    ``with`` block) deletes it, so a failed render never leaves a truncated
+    image that looks finished.
+    """
+
+    def __init__(self, path: Path, width: int, height: int) -> None:
+        self.path = Path(path)
+        self.width = width
+        self.height = height
+        self.rows_written = 0
+        self._tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._file = open(self._tmp, "wb")
+
+    def _finish(self) -> None:
+        """Write any trailer (before the file is closed and renamed)."""
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        if self.rows_written != self.height:
+            self.abort()
+            raise ValueError(f"{self.path.name}: got {self.rows_written} of {self.height} rows")
+        try:
+            self._finish()
+        except BaseException:
+            self.abort()
+            raise
+        self._file.close()
+        os.replace(self._tmp, self.path)
+
+    def abort(self) -> None:
+        """Discard the partial image."""
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class PngStream(_StripFile):
+    """RGBA PNG written strip by strip with zlib *level*.
+
+    Feed `write_rows` the premultiplied strips top to bottom until *height*
+    rows have been written, then `close` (or use as a context manager).
+    """
+
+    def __init__(self, path: Path, width: int, height: int, level: int = DEFAULT_PNG_LEVEL) -> None:
+        super().__init__(path, width, height)
+        self._zlib = zlib.compressobj(level)
+        self._file.write(PNG_SIGNATURE)
+        self._file.write(_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+
+    def write_rows(self, data, rows: int, stride: int, x: int = 0) -> None:
+        """Append *rows* rows of *data*, starting at pixel column *x*."""
+        rgba = unpremultiply_rgba(data, self.width, rows, stride, x)
+        row = self.width * 4
+        compressed = self._zlib.compress(b"".join(b"\x00" + rgba[y * row:(y + 1) * row] for y in range(rows)))
+        if compressed:
+            self._file.write(_chunk(b"IDAT", compressed))
+        self.rows_written += rows
+
+    def _finish(self) -> None:
+        self._file.write(_chunk(b"IDAT", self._zlib.flush()))
+        self._file.write(_chunk(b"IEND", b""))
+
+
+class RawStream(_StripFile):
+    """Rawvideo frame (see `write_raw`) written strip by strip."""
+
+    def __init__(self, path: Path, width: int, height: int) -> None:
+        super().__init__(path, width, height)
+        self.meta = raw_meta(width, height)
+
+    def write_rows(self, data, rows: int, stride: int, x: int = 0) -> None:
+        """Append *rows* rows of *data*, starting at pixel column *x*."""
+        view = memoryview(data).cast("B")
+        start, row = x * 4, self.width * 4
+        for y in range(rows):
+            self._file.write(view[y * stride + start:y * stride + start + row])
+        self.rows_written += rows
+
+
+def pack_raw(data, width: int, height: int, stride: int) -> bytes:
+    """The buffer as one contiguous rawvideo frame (row padding dropped)."""
+    row = width * 4
+    view = memoryview(data).cast("B")
+    if stride == row:
+        return bytes(view[: row * height])
+    return b"".join(view[y * stride:y * stride + row] for y in range(height))
+
+
+def raw_meta(width: int, height: int) -> Dict[str, object]:
+    """Sidecar description of a rawvideo frame in Cairo's native layout."""
+    return {"format": "rawvideo", "pix_fmt": RAW_PIX_FMT, "width": width, "height": height, "premultiplied": True}
+
+
+def load_raw_meta(path: Path) -> Dict[str, object] | None:
+    """Rawvideo description from the `.json` sidecar of a `.raw` image, if any."""
+    if path.suffix != RAW_SUFFIX:
+        return None
+    sidecar = path.with_suffix(".json")
+    if not sidecar.exists():
+        raise FileNotFoundError(f"raw image {path} has no {sidecar.name} sidecar")
+    meta = json.loads(sidecar.read_text(encoding="utf-8"))
+    if meta.get("format") != "rawvideo":
+        raise ValueError(f"{sidecar} does not describe a rawvideo image")
+    return meta
+
+
+def image_size(path: Path) -> Tuple[int, int] | None:
+    """``(width, height)`` of a PNG (from its IHDR) or `.raw` image, if known."""
+    raw = load_raw_meta(path)
+    if raw:
+        return int(raw["width"]), int(raw["height"])
+    with open(path, "rb") as f:
+        head = f.read(24)
+    if len(head) < 24 or head[:8] != PNG_SIGNATURE or head[12:16] != b"IHDR":
+        return None
+    width, height = struct.unpack(">II", head[16:24])
+    return width, height
@@ -6,17 +6,29 @@ with `video_pipeline.py`.
 Usage (inside project root):
     manim -pqh manim_fade_scene.py FadePNGScene
 
+Batch mode renders one clip per PNG inside a single Python process, so Manim's
+import, config setup and renderer/camera construction are paid once.  The
+manifest has the same format as `video_pipeline.py --batch` (PNG paths or JSON
+job objects):
+    python3 manim_fade_scene.py --batch stills.txt
+
 The output video is then post-processed by `video_pipeline.py` if further encoding
 (clean looping, h.265) is needed.  You can skip running Manim if you only need
 FFmpeg-based fades.
 """
 from __future__ import annotations
 
+import argparse
+import sys
+import time
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List
 
 import yaml
 from manim import *  # noqa: F401,F403 – Manim constants (Scene, VGroup, etc.)
+from manim.renderer.cairo_renderer import CairoRenderer
+
+import video_pipeline as vp
 
 ROOT = Path(__file__).resolve().parent
 CFG_PATH = ROOT / "config_video.yml"
@@ -30,17 +42,40 @@ EASING_TO_RATE_FUNC: Dict[str, callable] = {
 }
 
 
+# `-q` letters of the manim CLI
+QUALITIES = {
+    "l": "low_quality",
+    "m": "medium_quality",
+    "h": "high_quality",
+    "p": "production_quality",
+    "k": "fourk_quality",
+}
+
+
+def load_video_config() -> dict:
+    if not CFG_PATH.exists():
+        raise FileNotFoundError(f"Config file not found: {CFG_PATH}")
+    with CFG_PATH.open("r", encoding="utf-8") as f:
+        return yaml.safe_load(f)
+
+
 class FadePNGScene(Scene):
-    """Fade a static PNG in/out according to YAML config."""
+    """Fade a static PNG in/out according to YAML config.
 
-    def construct(self) -> None:  # noqa: D401 – Manim convention
-        if not CFG_PATH.exists():
-            raise FileNotFoundError(f"Config file not found: {CFG_PATH}")
+    Without arguments (as instantiated by the ``manim`` CLI) the PNG and
+    timings come from `config_video.yml`; the batch driver passes a job's
+    *png_path* and *video_cfg* and a shared *renderer* instead.
+    """
+
+    def __init__(self, png_path: str | None = None, video_cfg: dict | None = None, **kwargs) -> None:
+        self.png_path = png_path
+        self.video_cfg = video_cfg
+        super().__init__(**kwargs)
 
-        with CFG_PATH.open("r", encoding="utf-8") as f:
-            cfg = yaml.safe_load(f)
+    def construct(self) -> None:  # noqa: D401 – Manim convention
+        cfg = self.video_cfg or load_video_config()
 
-        png_path = str((ROOT / cfg["png_path"]).expanduser())
+        png_path = self.png_path or str((ROOT / cfg["png_path"]).expanduser())
         fade_in_dur = cfg.get("fade_in_duration", 1.5)
         fade_out_dur = cfg.get("fade_out_duration", 1.5)
         total_dur = cfg.get("total_duration", 10)
@@ -59,7 +94,78 @@ class FadePNGScene(Scene):
 
         # Fade-in
         self.play(img.animate.set_opacity(1.0), run_time=fade_in_dur, rate_func=rate_in)
-        # Static hold
-        self.wait(max(0, steady_dur))
+        # Static hold – nothing changes, so render one frame and repeat it
+        self.wait(max(0, steady_dur), frozen_frame=True)
         # Fade-out
         self.play(img.animate.set_opacity(0.0), run_time=fade_out_dur, rate_func=rate_out)
+
+
+def reset_renderer(renderer: CairoRenderer) -> None:
+    """Clear the per-scene state a `CairoRenderer` keeps between scenes.
+
+    `Scene.__init__` only swaps the renderer's file writer; the play counter
+    (which indexes the new writer's partial movie files), clock, animation
+    hashes and cached static image would otherwise leak into the next scene.
+    """
+    renderer.num_plays = 0
+    renderer.time = 0
+    renderer.animations_hashes = []
+    renderer.static_image = None
+    renderer.skip_animations = renderer._original_skipping_status
+
+
+def render_batch(jobs: List[dict]) -> List[Dict[str, object]]:
+    """Render one clip per job in this process, sharing one renderer.
+
+    Jobs are `video_pipeline.read_batch` configs.  Each clip is written to its
+    `output_video`, whose suffix picks Manim's movie format.  Quality and
+    transparency are global: set them on `config` before calling.  Returns one
+    ``{"output", "seconds", "error"}`` dict per job.
+    """
+    renderer = CairoRenderer()  # camera and pixel buffers built once
+    results = []
+    for i, job in enumerate(jobs, 1):
+        out = (ROOT / job["output_video"]).expanduser()
+        overrides = {"output_file": str(out.with_suffix("")), "format": out.suffix.lstrip(".") or "mp4"}
+        start = time.perf_counter()
+        error = None
+        try:
+            png_path = vp.resolve_png_path(job)
+            reset_renderer(renderer)
+            with tempconfig(overrides):
+                FadePNGScene(png_path=str(png_path), video_cfg=job, renderer=renderer).render()
+        except Exception as exc:  # noqa: BLE001 – one bad still must not stop the batch
+            error = f"{type(exc).__name__}: {exc}"
+        seconds = time.perf_counter() - start
+        print(f"{'✗' if error else '✓'} [{i}/{len(jobs)}] {job['output_video']} {seconds:.2f}s"
+              + (f" – {error}" if error else ""))
+        results.append({"output": job["output_video"], "seconds": seconds, "error": error})
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Batch PNG → fade clip rendering with Manim")
+    ap.add_argument("--batch", required=True, help="manifest of PNG paths / JSON job objects")
+    ap.add_argument("--quality", choices=sorted(QUALITIES), help="manim quality preset (default: size/fps from config)")
+    args = ap.parse_args()
+
+    cfg = load_video_config()
+    if args.quality:
+        config.quality = QUALITIES[args.quality]
+    else:
+        config.pixel_width = cfg.get("width", config.pixel_width)
+        config.pixel_height = cfg.get("height", config.pixel_height)
+        config.frame_rate = cfg.get("fps", config.frame_rate)
+    # The camera reads this when the shared renderer is built.
+    config.transparent = Path(cfg["output_video"]).suffix in (".webm", ".mov")
+
+    jobs = vp.read_batch(Path(args.batch), cfg)
+    start = time.perf_counter()
+    results = render_batch(jobs)
+    failed = [r for r in results if r["error"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} clips rendered in {time.perf_counter() - start:.1f}s")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,142 +27,858 @@ folder.
 from __future__ import annotations
 
 import argparse
-from html import escape
+import json
+import functools
+import io
+import math
+import re
+import threading
 from pathlib import Path
-from typing import Dict, Tuple
-
-import cairo  # type: ignore
-import gi  # type: ignore
-import colorsys
-
-gi.require_version("Pango", "1.0")
-
-gi.require_version("PangoCairo", "1.0")
-from gi.repository import Pango, PangoCairo  # type: ignore
-
-import yaml
-from datetime import datetime
-
-# Canvas/settings – populated from YAML config (initial placeholders)
-CANVAS_WIDTH: int
-CANVAS_HEIGHT: int
-WRAP_RATIO: float
-WRAP_WIDTH: int
-BACKGROUND_COLOR: Tuple[float, float, float]
-TEXT_COLOR: Tuple[float, float, float]
-DEFAULT_HIGHLIGHT_COLOR: Tuple[float, float, float]
-BASE_FONT_FAMILY: str
-BASE_FONT_SIZE_PT: int
-COLOR_VARIANT_COLOR: Tuple[float, float, float]
-SIZE_VARIANT_FACTOR: float
-FAMILY_VARIANT_FONT: str
-WEIGHT_VARIANT_WEIGHT: str
-STYLE_VARIANT_STYLE: str
-UNDERLINE_VARIANT_UNDERLINE: str
-STRIKE_VARIANT_STRIKETHROUGH: str
-RISE_VARIANT_RISE: int
+from typing import Dict, Iterator, List, NamedTuple, Tuple
+
+import highlight_core as core
+from highlight_core import (  # noqa: F401 – re-exported for existing callers
+    Settings,
+    Variant,
+    apply_config,
+    build_variants,
+    highlight_byte_ranges,
+    hsla_to_rgba,
+    load_config,
+    make_markup,
+    make_multi_markup,
+    resolve_output_dir,
+    rgb_to_hex,
+    variant_markup,
+    video_canvas,
+)
+import image_io
+from image_io import RAW_PIX_FMT
+from render_cache import cache_key
+import tracing
+from tracing import span
+
+# Cairo / Pango backend – imported on first render by _load_backend() so that
+# importing this module (or highlight_core) stays cheap.
+cairo = None  # type: ignore[assignment]
+Pango = None  # type: ignore[assignment]
+PangoCairo = None  # type: ignore[assignment]
+
+
+def _load_backend() -> None:
+    global cairo, Pango, PangoCairo
+    if PangoCairo is not None:
+        return
+    with span("backend.import"):
+        import cairo as _cairo  # type: ignore
+        import gi  # type: ignore
+
+        gi.require_version("Pango", "1.0")
+        gi.require_version("PangoCairo", "1.0")
+        from gi.repository import Pango as _Pango, PangoCairo as _PangoCairo  # type: ignore
+    cairo, Pango, PangoCairo = _cairo, _Pango, _PangoCairo
+
+
+class Page(NamedTuple):
+    """One page of a paginated layout.
+
+    *top* and *bottom* delimit the page in layout pixels; *lines* holds
+    ``(line index, x, baseline)`` for each of its lines, with *x* already
+    including the horizontal centring offset.
+    """
 
-# ---------------------------------------------------------------------------
-# Default initial values (used before YAML config is applied)
-CANVAS_WIDTH = 1920
-CANVAS_HEIGHT = 1080
-WRAP_RATIO = 0.85
-WRAP_WIDTH = int(CANVAS_WIDTH * WRAP_RATIO)
-# RGBA for background (alpha allows transparency)
-BACKGROUND_RGBA = (0.0, 0.0, 0.0, 0.0)  # default fully transparent
-TEXT_COLOR = (1.0, 1.0, 1.0)
-DEFAULT_HIGHLIGHT_COLOR = (0.5, 1.0, 1.0)
-BASE_FONT_FAMILY = "Arial"
-BASE_FONT_SIZE_PT = 50
-COLOR_VARIANT_COLOR = (0.0, 0.6, 1.0)
-SIZE_VARIANT_FACTOR = 1.4
-FAMILY_VARIANT_FONT = "Courier New"
-WEIGHT_VARIANT_WEIGHT = "bold"
-STYLE_VARIANT_STYLE = "italic"
-UNDERLINE_VARIANT_UNDERLINE = "single"
-STRIKE_VARIANT_STRIKETHROUGH = "true"
-RISE_VARIANT_RISE = 10000
-# ---------------------------------------------------------------------------
+    top: int
+    bottom: int
+    lines: List[Tuple[int, float, float]]
 
 
-# ---------------------------------------------------------------------------
+def split_pages(line_ranges: List[Tuple[int, int]], page_height: int) -> List[Tuple[int, int]]:
+    """Group consecutive lines into pages no taller than *page_height*.
+
+    *line_ranges* are the ``(top, bottom)`` pixel extents of each line; returns
+    ``(first, last + 1)`` line index ranges.  A line taller than a page gets a
+    page of its own.
+    """
+    pages = []
+    first = 0
+    for i, (_, bottom) in enumerate(line_ranges):
+        if i > first and bottom - line_ranges[first][0] > page_height:
+            pages.append((first, i))
+            first = i
+    if line_ranges:
+        pages.append((first, len(line_ranges)))
+    return pages
+
+
+class LineMetrics(NamedTuple):
+    """Position of one layout line, in layout pixels.
+
+    *start*/*end* are UTF-8 byte offsets into the layout text; *top*/*bottom*
+    its y-range (lines tile the layout without gaps); *ink_top*/*ink_bottom*
+    the vertical ink extents, which may overflow that range.
+    """
+
+    start: int
+    end: int
+    x: float
+    baseline: float
+    top: int
+    bottom: int
+    ink_top: int
+    ink_bottom: int
 
-def rgb_to_hex(rgb: Tuple[float, float, float]) -> str:
-    return "#" + "".join(f"{int(c*255):02x}" for c in rgb)
 
+_INNER_SPAN_RE = re.compile(r"<span\b[^>]*>|</span>")
 
-def hsla_to_rgba(hsla: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
-    """Convert HSLA (0-1 range) to RGBA.
 
-    HSLA = hue, saturation, lightness, alpha.  We use colorsys.hls_to_rgb
-    which expects hue, lightness, saturation.
+def base_markup(markup: str) -> str:
+    """*markup* without its highlight spans: the outer span and the text.
+
+    Everything `make_markup` styles outside the highlight (font, size, text
+    colour) lives on the outer span, so two variants of one sentence share
+    this string exactly when they differ only inside the highlights.
     """
-    h, s, l, a = hsla
-    r, g, b = colorsys.hls_to_rgb(h, l, s)
-    return (r, g, b, a)
+    if not markup.startswith("<span"):
+        return markup
+    head = markup.index(">") + 1
+    return markup[:head] + _INNER_SPAN_RE.sub("", markup[head:])
 
 
-def make_markup(
-    sentence: str,
-    phrase: str,
-    *,
-    extra_attrs: Dict[str, str] | None = None,
-    highlight_color: Tuple[float, float, float] | None = None,
-    font_size_pt: float | None = None,
-) -> str:
-    if phrase not in sentence:
-        raise ValueError("highlight phrase not found in sentence")
+def dirty_lines(lines: List[LineMetrics], ranges: List[Tuple[int, int]]) -> List[int]:
+    """Indices of *lines* overlapping any byte range in *ranges*."""
+    return [i for i, ln in enumerate(lines) if any(a < max(ln.end, ln.start + 1) and b > ln.start for a, b in ranges)]
 
-    start = sentence.index(phrase)
-    end = start + len(phrase)
 
+class RenderSession:
+    """Cairo surface/context and Pango layout kept warm across renders.
 
+    One session owns a single ``width x height`` ARGB32 surface, its context,
+    a Pango context from the shared font map and one layout.  Each render
+    clears the surface and only swaps the layout's markup, so nothing is
+    reallocated between variants.  Sessions are not thread-safe.
 
-    if highlight_color is None:
-        highlight_color = DEFAULT_HIGHLIGHT_COLOR
-    if font_size_pt is None:
-        font_size_pt = BASE_FONT_SIZE_PT
+    A strip session (*surface_height* < *height*) lays text out on the full
+    canvas but only owns a ``width x surface_height`` surface; it renders
+    with :meth:`draw_strips`.
+    """
 
-    base_span_open = f"<span font_family='{BASE_FONT_FAMILY}' size='{int(font_size_pt*1024)}' foreground='{rgb_to_hex(TEXT_COLOR)}'>"
+    def __init__(self, width: int, height: int, surface_height: int | None = None) -> None:
+        _load_backend()
+        self.width = width
+        self.height = height
+        self.surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, surface_height or height)
+        self.ctx = cairo.Context(self.surface)
+        self.font_map = PangoCairo.FontMap.get_default()
+        self.pango_context = self.font_map.create_context()
+        PangoCairo.update_context(self.ctx, self.pango_context)
+        self.layout = Pango.Layout.new(self.pango_context)
+        self.layout.set_wrap(Pango.WrapMode.WORD_CHAR)
+        # (text key, line metrics, snapshot surface, highlight ranges) of the
+        # first full render of the current text; see draw_incremental()
+        self._base: Tuple[tuple, List[LineMetrics], cairo.ImageSurface, List[Tuple[int, int]]] | None = None
+
+    def _layout(self, markup: str, wrap_width: int) -> Tuple[float, float, Tuple[int, int, int, int]]:
+        """Set *markup* on the layout.
+
+        Returns the canvas origin that centres the layout and the union of its
+        ink and logical rectangles as ``(x, y, width, height)`` in layout pixels.
+        """
+        layout = self.layout
+        with span("pango.layout"):
+            layout.set_width(wrap_width * Pango.SCALE)
+            layout.set_markup(markup, -1)
+            ink, logical = layout.get_pixel_extents()
+        x0 = min(ink.x, logical.x)
+        y0 = min(ink.y, logical.y)
+        x1 = max(ink.x + ink.width, logical.x + logical.width)
+        y1 = max(ink.y + ink.height, logical.y + logical.height)
+        return (self.width-logical.width)/2, (self.height-logical.height)/2, (x0, y0, x1 - x0, y1 - y0)
+
+    @property
+    def surface_bytes(self) -> int:
+        """Memory held by this session's surfaces (incl. the incremental base)."""
+        total = self.surface.get_stride() * self.surface.get_height()
+        if self._base is not None:
+            total += self._base[2].get_stride() * self._base[2].get_height()
+        return total
+
+    def _clear(self, background: Tuple[float, float, float, float]) -> None:
+        ctx = self.ctx
+        ctx.identity_matrix()
+        ctx.save()
+        ctx.set_operator(cairo.OPERATOR_SOURCE)  # replace, don't blend over last render
+        ctx.set_source_rgba(*background)
+        ctx.paint()
+        ctx.restore()
+
+    def _line_metrics(self, origin_x: float) -> List[LineMetrics]:
+        scale = Pango.SCALE
+        lines = []
+        it = self.layout.get_iter()
+        while True:
+            line = it.get_line_readonly()
+            y0, y1 = it.get_line_yrange()
+            ink, logical = it.get_line_extents()
+            lines.append(LineMetrics(
+                line.start_index,
+                line.start_index + line.length,
+                origin_x + logical.x / scale,
+                it.get_baseline() / scale,
+                y0 // scale,
+                -(-y1 // scale),
+                ink.y // scale,
+                -(-(ink.y + ink.height) // scale),
+            ))
+            if not it.next_line():
+                break
+        return lines
+
+    def draw(
+        self,
+        markup: str,
+        *,
+        wrap_width: int,
+        background: Tuple[float, float, float, float],
+    ) -> None:
+        """Clear the surface to *background* and draw *markup* centred on it."""
+        self._clear(background)
+        origin_x, origin_y, _ = self._layout(markup, wrap_width)
+        self.ctx.translate(origin_x, origin_y)
+
+        with span("cairo.raster"):
+            PangoCairo.show_layout(self.ctx, self.layout)
+            self.surface.flush()
+
+    def draw_incremental(
+        self,
+        markup: str,
+        *,
+        wrap_width: int,
+        background: Tuple[float, float, float, float],
+        dirty: List[Tuple[int, int]],
+    ) -> bool:
+        """Like :meth:`draw`, reusing the base render of the same text.
+
+        *dirty* lists the byte ranges whose attributes differ between variants
+        (the highlight).  The first render of a text becomes the base; it is
+        only reused by markup with the same text and the same styling outside
+        the highlight spans (see `base_markup`).  A later
+        render whose lines break and measure exactly like the base copies it
+        and re-rasterises only the horizontal bands of the lines touching
+        *dirty* (in either render); anything else is drawn in full.  Returns
+        True when the base was reused.
+        """
+        origin_x, origin_y, _ = self._layout(markup, wrap_width)
+        lines = self._line_metrics(origin_x)
+        key = (base_markup(markup), wrap_width, tuple(background))
+        base = self._base
+        if base is None or base[0] != key or [ln[:6] for ln in base[1]] != [ln[:6] for ln in lines]:
+            self._clear(background)
+            self.ctx.translate(origin_x, origin_y)
+            with span("cairo.raster"):
+                PangoCairo.show_layout(self.ctx, self.layout)
+                self.surface.flush()
+            if base is None or base[0] != key:
+                snapshot = cairo.ImageSurface(cairo.FORMAT_ARGB32, self.width, self.height)
+                snap_ctx = cairo.Context(snapshot)
+                snap_ctx.set_source_surface(self.surface)
+                snap_ctx.set_operator(cairo.OPERATOR_SOURCE)
+                snap_ctx.paint()
+                self._base = (key, lines, snapshot, list(dirty))
+            return False
+
+        _, base_lines, snapshot, base_dirty = base
+        redraw = sorted(set(dirty_lines(lines, dirty)) | set(dirty_lines(base_lines, base_dirty)))
+        ctx = self.ctx
+        ctx.identity_matrix()
+        with span("cairo.raster", incremental=True, lines=len(redraw)):
+            ctx.save()
+            ctx.set_operator(cairo.OPERATOR_SOURCE)
+            ctx.set_source_surface(snapshot)
+            ctx.paint()
+            ctx.restore()
+            for i in redraw:
+                # The band covers the line and the ink of both renders, then
+                # every line whose ink reaches into it is redrawn clipped to it.
+                top = min(lines[i].top, lines[i].ink_top, base_lines[i].ink_top)
+                bottom = max(lines[i].bottom, lines[i].ink_bottom, base_lines[i].ink_bottom)
+                ctx.save()
+                ctx.rectangle(0, origin_y + top, self.width, bottom - top)
+                ctx.clip()
+                ctx.set_operator(cairo.OPERATOR_SOURCE)
+                ctx.set_source_rgba(*background)
+                ctx.paint()
+                ctx.set_operator(cairo.OPERATOR_OVER)
+                for j, ln in enumerate(lines):
+                    if min(ln.top, ln.ink_top) < bottom and max(ln.bottom, ln.ink_bottom) > top:
+                        ctx.move_to(ln.x, origin_y + ln.baseline)
+                        PangoCairo.show_layout_line(ctx, self.layout.get_line_readonly(j))
+                ctx.restore()
+            self.surface.flush()
+        return True
+
+    def draw_cropped(
+        self,
+        markup: str,
+        *,
+        wrap_width: int,
+        background: Tuple[float, float, float, float],
+        padding: int,
+    ) -> Tuple[cairo.ImageSurface, Dict[str, object]]:
+        """Draw *markup* onto a surface just large enough for its extents.
+
+        Returns the cropped surface and placement metadata: where its top-left
+        corner sits on the full ``width x height`` canvas that :meth:`draw`
+        would have produced.
+        """
+        origin_x, origin_y, box = self._layout(markup, wrap_width)
+        left, top, width, height = self._crop_box(origin_x, origin_y, box, padding)
+
+        with span("cairo.raster", cropped=True):
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            ctx = cairo.Context(surface)
+            ctx.set_source_rgba(*background)
+            ctx.paint()
+            ctx.translate(origin_x - left, origin_y - top)
+            PangoCairo.show_layout(ctx, self.layout)
+            surface.flush()
+
+        return surface, self._placement(left, top, width, height, background)
+
+    def _crop_box(
+        self, origin_x: float, origin_y: float, box: Tuple[int, int, int, int], padding: int
+    ) -> Tuple[int, int, int, int]:
+        """Canvas rectangle ``(left, top, width, height)`` of *box* plus *padding*."""
+        bx, by, bw, bh = box
+        left = max(0, math.floor(origin_x + bx) - padding)
+        top = max(0, math.floor(origin_y + by) - padding)
+        right = min(self.width, math.ceil(origin_x + bx + bw) + padding)
+        bottom = min(self.height, math.ceil(origin_y + by + bh) + padding)
+        return left, top, max(1, right - left), max(1, bottom - top)
+
+    def _placement(
+        self, left: int, top: int, width: int, height: int, background: Tuple[float, float, float, float]
+    ) -> Dict[str, object]:
+        return {
+            "x": left,
+            "y": top,
+            "width": width,
+            "height": height,
+            "canvas_width": self.width,
+            "canvas_height": self.height,
+            "background_rgba": list(background),
+        }
+
+    def draw_strips(
+        self,
+        markup: str,
+        *,
+        wrap_width: int,
+        background: Tuple[float, float, float, float],
+        padding: int | None = None,
+    ) -> Tuple[Dict[str, object] | None, Iterator[Tuple[int, int]]]:
+        """Rasterise *markup* strip by strip into the (strip-sized) surface.
+
+        Covers the full canvas, or with *padding* the same crop as
+        :meth:`draw_cropped`, whose placement is then returned.  The iterator
+        draws one strip per step and yields ``(x, rows)``: the strip occupies
+        the top *rows* rows of `surface` from pixel column *x* and must be
+        consumed before the next step.  Only lines whose ink or logical
+        extents reach into a strip are drawn into it.
+        """
+        origin_x, origin_y, box = self._layout(markup, wrap_width)
+        lines = self._line_metrics(origin_x)
+        if padding is None:
+            placement = None
+            left, top, width, height = 0, 0, self.width, self.height
+        else:
+            left, top, width, height = self._crop_box(origin_x, origin_y, box, padding)
+            placement = self._placement(left, top, width, height, background)
+        strip = self.surface.get_height()
+
+        def strips() -> Iterator[Tuple[int, int]]:
+            for y in range(top, top + height, strip):
+                rows = min(strip, top + height - y)
+                self._clear(background)
+                with span("cairo.raster", strip=y):
+                    for i, ln in enumerate(lines):
+                        line_top = origin_y + min(ln.top, ln.ink_top)
+                        line_bottom = origin_y + max(ln.bottom, ln.ink_bottom)
+                        if line_top < y + rows and line_bottom > y:
+                            self.ctx.move_to(ln.x, origin_y - y + ln.baseline)
+                            PangoCairo.show_layout_line(self.ctx, self.layout.get_line_readonly(i))
+                    self.surface.flush()
+                yield left, rows
+
+        return placement, strips()
+
+    def paginate(self, markup: str, *, wrap_width: int, page_height: int) -> List[Page]:
+        """Lay *markup* out once and split it into pages at line boundaries.
+
+        The layout keeps the markup afterwards, so every returned page can be
+        drawn with :meth:`draw_page` without shaping the text again.
+        """
+        origin_x, _, _ = self._layout(markup, wrap_width)
+        scale = Pango.SCALE
+        metrics = []
+        with span("pango.paginate"):
+            it = self.layout.get_iter()
+            while True:
+                y0, y1 = it.get_line_yrange()
+                _, logical = it.get_line_extents()
+                metrics.append((y0 // scale, -(-y1 // scale), origin_x + logical.x / scale, it.get_baseline() / scale))
+                if not it.next_line():
+                    break
+        pages = []
+        for first, last in split_pages([(m[0], m[1]) for m in metrics], page_height):
+            lines = [(i, metrics[i][2], metrics[i][3]) for i in range(first, last)]
+            pages.append(Page(metrics[first][0], metrics[last - 1][1], lines))
+        return pages
+
+    def draw_page(self, page: Page, *, background: Tuple[float, float, float, float]) -> None:
+        """Clear the surface and draw *page* of the last :meth:`paginate` call.
+
+        Only the page's lines are drawn, vertically centred on the canvas.
+        """
+        ctx = self.ctx
+        self._clear(background)
+
+        offset_y = (self.height - (page.bottom - page.top)) / 2 - page.top
+        with span("cairo.raster", page=True):
+            for index, x, baseline in page.lines:
+                ctx.move_to(x, offset_y + baseline)
+                PangoCairo.show_layout_line(ctx, self.layout.get_line_readonly(index))
+            self.surface.flush()
+
+
+_THREAD = threading.local()
+
+
+def get_session(width: int, height: int, surface_height: int | None = None) -> RenderSession:
+    """Return this thread's session for a ``width x height`` canvas.
+
+    Sessions are per thread, so a thread pool can render concurrently (Cairo
+    and Pango release the GIL while rasterising).  *surface_height* asks for
+    a strip session (see `RenderSession`).
+    """
+    sessions: Dict[Tuple[int, int, int | None], RenderSession] = _THREAD.__dict__.setdefault("sessions", {})
+    key = (width, height, surface_height)
+    session = sessions.get(key)
+    if session is None:
+        with span("session.init", width=width, height=height, surface_height=surface_height):
+            session = sessions[key] = RenderSession(width, height, surface_height)
+    return session
 
-    attrs = {
-        "foreground": rgb_to_hex(highlight_color),
-    }
-    if extra_attrs:
-        attrs.update(extra_attrs)
-
-    attrs_str = " ".join(f"{k}='{v}'" for k, v in attrs.items())
-    highlight_open = f"<span {attrs_str}>"
-
-    return (
-        base_span_open
-        + escape(sentence[:start])
-        + highlight_open
-        + escape(phrase)
-        + "</span>"  # close highlight
-        + escape(sentence[end:])
-        + "</span>"  # close base
+
+def _note_surfaces(nbytes: int) -> None:
+    """Record the Cairo surface memory a render on this thread held at once."""
+    _THREAD.surface_peak = max(getattr(_THREAD, "surface_peak", 0), nbytes)
+
+
+def take_surface_peak() -> int:
+    """Peak surface bytes of this thread's renders since the last call."""
+    peak = getattr(_THREAD, "surface_peak", 0)
+    _THREAD.surface_peak = 0
+    return peak
+
+
+class Raster(NamedTuple):
+    """Pixel buffer of a render, ready to hand to an encoder.
+
+    *data* is Cairo's premultiplied ARGB32 memory in native byte order, which
+    FFmpeg calls ``bgra`` on little-endian hosts and ``argb`` on big-endian
+    ones (see *pix_fmt*).
+    """
+
+    data: memoryview
+    width: int
+    height: int
+    stride: int
+    pix_fmt: str
+
+
+def _draw_full(session: RenderSession, markup: str, dirty: List[Tuple[int, int]] | None, s: Settings) -> None:
+    """Full-canvas draw, incremental when *dirty* ranges are known."""
+    if dirty is not None and s.incremental_variants:
+        session.draw_incremental(markup, wrap_width=s.wrap_width, background=s.background_rgba, dirty=dirty)
+    else:
+        session.draw(markup, wrap_width=s.wrap_width, background=s.background_rgba)
+    _note_surfaces(session.surface_bytes)
+
+
+def render_raster(
+    markup: str, dirty: List[Tuple[int, int]] | None = None, *, settings: Settings | None = None
+) -> Raster:
+    """Render *markup* on the full canvas and expose the surface memory.
+
+    No PNG is encoded.  The buffer belongs to the shared session surface and
+    is overwritten by the next render on the same canvas size; copy it
+    (``bytes(raster.data)``) if it has to outlive that.  *dirty* (see
+    `highlight_byte_ranges`) enables incremental variant rendering.
+    *settings* defaults to `highlight_core.SETTINGS`, here and below.
+    """
+    s = settings or core.SETTINGS
+    session = get_session(s.canvas_width, s.canvas_height)
+    _draw_full(session, markup, dirty, s)
+    surface = session.surface
+    return Raster(surface.get_data(), surface.get_width(), surface.get_height(), surface.get_stride(), RAW_PIX_FMT)
+
+
+def placement_path(output: Path) -> Path:
+    """Sidecar holding the canvas placement of a cropped or raw render."""
+    return output.with_suffix(".json")
+
+
+def output_suffix(settings: Settings | None = None) -> str:
+    """File suffix of the image `render` writes for the configured format."""
+    s = settings or core.SETTINGS
+    return image_io.RAW_SUFFIX if s.output_format == "raw" else ".png"
+
+
+def write_image(
+    surface, output: Path, sidecar: Dict[str, object] | None = None, settings: Settings | None = None
+) -> bool:
+    """Write *surface* to *output* in the configured format.
+
+    *sidecar* (crop placement) is merged with the rawvideo description of raw
+    output and written to `placement_path(output)`; returns whether a sidecar
+    was written.
+    """
+    s = settings or core.SETTINGS
+    with span("png.write", format=s.output_format, level=s.png_compression):
+        sidecar = dict(sidecar or {})
+        args = (surface.get_data(), surface.get_width(), surface.get_height(), surface.get_stride())
+        if s.output_format == "raw":
+            sidecar.update(image_io.write_raw(output, *args))
+        elif s.png_compression is None:
+            surface.write_to_png(str(output))
+        else:
+            image_io.write_png(output, *args, int(s.png_compression))
+        _write_sidecar(output, sidecar)
+    return bool(sidecar)
+
+
+def _write_sidecar(output: Path, sidecar: Dict[str, object]) -> None:
+    """Write *sidecar* next to *output*, or remove a stale one if it is empty."""
+    path = placement_path(output)
+    path.unlink(missing_ok=True)  # may be stale or hardlinked into the render cache
+    if sidecar:
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(sidecar, f, indent=2)
+
+
+def strip_rows(settings: Settings | None = None) -> int | None:
+    """Rows per strip when the canvas exceeds `memory_budget_mb`, else None.
+
+    The budget covers the strip surface plus, for PNG output, the encoder's
+    scratch buffers (`image_io.PNG_SCRATCH_FACTOR`).
+    """
+    s = settings or core.SETTINGS
+    if s.memory_budget_mb is None:
+        return None
+    factor = 1 if s.output_format == "raw" else image_io.PNG_SCRATCH_FACTOR
+    rows = int(s.memory_budget_mb * 1024 * 1024) // (s.canvas_width * 4 * factor)
+    return max(1, rows) if rows < s.canvas_height else None
+
+
+def render_strips(markup: str, output: Path, rows: int, settings: Settings | None = None) -> bool:
+    """Render *markup* to *output* in strips of *rows* rows; True if a sidecar was written.
+
+    Each strip is streamed to the image file as soon as it is drawn, so only
+    a ``canvas_width x rows`` surface is ever allocated.  Output matches
+    `render` (full canvas or `crop_output`), except that PNGs are always
+    written by `image_io` (zlib level `png_compression`, default 6).
+    """
+    s = settings or core.SETTINGS
+    session = get_session(s.canvas_width, s.canvas_height, rows)
+    placement, strips = session.draw_strips(
+        markup,
+        wrap_width=s.wrap_width,
+        background=s.background_rgba,
+        padding=s.crop_padding if s.crop_output else None,
+    )
+    width = int(placement["width"]) if placement else s.canvas_width  # type: ignore[call-overload]
+    height = int(placement["height"]) if placement else s.canvas_height  # type: ignore[call-overload]
+    sidecar = dict(placement or {})
+    stride = session.surface.get_stride()
+    if s.output_format == "raw":
+        writer: image_io.PngStream | image_io.RawStream = image_io.RawStream(output, width, height)
+        sidecar.update(writer.meta)  # type: ignore[union-attr]
+    else:
+        level = image_io.DEFAULT_PNG_LEVEL if s.png_compression is None else int(s.png_compression)
+        writer = image_io.PngStream(output, width, height, level)
+    with span("strips.render", rows=rows, width=width, height=height), writer:
+        for x, n in strips:
+            writer.write_rows(session.surface.get_data(), n, stride, x)
+    _write_sidecar(output, sidecar)
+    _note_surfaces(session.surface_bytes)
+    return bool(sidecar)
+
+
+_FONT_FAMILY_RE = re.compile(r"font_family='([^']*)'")
+
+
+@functools.lru_cache(maxsize=None)
+def resolve_font(family: str) -> str:
+    """Family fontconfig actually picks for *family* (e.g. a fallback)."""
+    _load_backend()
+    font_map = PangoCairo.FontMap.get_default()
+    font = font_map.load_font(font_map.create_context(), Pango.FontDescription.from_string(family))
+    return font.describe().get_family() if font is not None else family
+
+
+def render_cache_key(markup: str, settings: Settings | None = None) -> str:
+    """Cache key covering every setting that changes the rendered pixels."""
+    s = settings or core.SETTINGS
+    families = sorted(set(_FONT_FAMILY_RE.findall(markup)))
+    return cache_key(
+        markup=markup,
+        canvas=(s.canvas_width, s.canvas_height),
+        wrap_width=s.wrap_width,
+        background=s.background_rgba,
+        fonts={f: resolve_font(f) for f in families},
+        crop=s.crop_padding if s.crop_output else None,
+        format=s.output_format,
+        png_compression=s.png_compression,
     )
 
 
-def render(markup: str, output: Path) -> None:
-    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, CANVAS_WIDTH, CANVAS_HEIGHT)
-    ctx = cairo.Context(surface)
+def render(
+    markup: str,
+    output: Path,
+    *,
+    quiet: bool = False,
+    dirty: List[Tuple[int, int]] | None = None,
+    settings: Settings | None = None,
+) -> None:
+    s = settings or core.SETTINGS
+    key = None
+    if s.render_cache is not None:
+        with span("cache.fetch"):
+            key = render_cache_key(markup, s)
+            hit = s.render_cache.fetch(key, output)
+        if hit:
+            if not quiet:
+                print(f"Cached {output}")
+            return
+        # A previous hit may have left *output* and its sidecar hardlinked to
+        # a cache entry; unlink both so writing in place cannot corrupt it.
+        output.unlink(missing_ok=True)
+        placement_path(output).unlink(missing_ok=True)
+
+    rows = strip_rows(s)
+    if rows is not None:
+        has_sidecar = render_strips(markup, output, rows, s)
+    elif s.crop_output:
+        session = get_session(s.canvas_width, s.canvas_height)
+        surface, placement = session.draw_cropped(
+            markup, wrap_width=s.wrap_width, background=s.background_rgba, padding=s.crop_padding
+        )
+        _note_surfaces(session.surface_bytes + surface.get_stride() * surface.get_height())
+        has_sidecar = write_image(surface, output, placement, s)
+    else:
+        session = get_session(s.canvas_width, s.canvas_height)
+        _draw_full(session, markup, dirty, s)
+        has_sidecar = write_image(session.surface, output, settings=s)
+
+    if s.render_cache is not None and key is not None:
+        files = [output, placement_path(output)] if has_sidecar else [output]
+        with span("cache.store"):
+            s.render_cache.store(key, files)
+    if not quiet:
+        print(f"Wrote {output}")
+
+
+def render_bytes(
+    markup: str,
+    *,
+    dirty: List[Tuple[int, int]] | None = None,
+    settings: Settings | None = None,
+) -> Tuple[bytes, Dict[str, object]]:
+    """In-memory `render`: the encoded image plus its sidecar metadata.
+
+    The metadata is what `render` would write to `placement_path` (crop
+    placement and/or rawvideo description), empty for a full-canvas PNG.
+    The render cache is not consulted.
+    """
+    s = settings or core.SETTINGS
+    session = get_session(s.canvas_width, s.canvas_height)
+    if s.crop_output:
+        surface, sidecar = session.draw_cropped(
+            markup, wrap_width=s.wrap_width, background=s.background_rgba, padding=s.crop_padding
+        )
+        _note_surfaces(session.surface_bytes + surface.get_stride() * surface.get_height())
+    else:
+        _draw_full(session, markup, dirty, s)
+        surface, sidecar = session.surface, {}
+    with span("png.write", format=s.output_format, level=s.png_compression):
+        args = (surface.get_data(), surface.get_width(), surface.get_height(), surface.get_stride())
+        if s.output_format == "raw":
+            return image_io.pack_raw(*args), {**sidecar, **image_io.raw_meta(*args[1:3])}
+        if s.png_compression is not None:
+            return image_io.encode_png(*args, int(s.png_compression)), sidecar
+        buf = io.BytesIO()
+        surface.write_to_png(buf)
+        return buf.getvalue(), sidecar
+
+
+def page_path(output: Path, number: int) -> Path:
+    """Output path of page *number* (1-based) of a paginated render."""
+    return output.with_name(f"{output.stem}_p{number:03d}{output.suffix}")
+
+
+def render_pages(
+    markup: str, output: Path, *, quiet: bool = False, settings: Settings | None = None
+) -> List[Path]:
+    """Render *markup* as a sequence of full-canvas pages; return their paths.
+
+    The text is shaped once; each page only translates and draws its own
+    lines.  Pages bypass the render cache and `crop_output`.
+    """
+    s = settings or core.SETTINGS
+    session = get_session(s.canvas_width, s.canvas_height)
+    page_height = max(1, s.canvas_height - 2 * s.page_margin)
+    pages = session.paginate(markup, wrap_width=s.wrap_width, page_height=page_height)
+    _note_surfaces(session.surface_bytes)
+    outputs = []
+    for number, page in enumerate(pages, 1):
+        path = page_path(output, number)
+        session.draw_page(page, background=s.background_rgba)
+        write_image(session.surface, path, settings=s)
+        outputs.append(path)
+        if not quiet:
+            print(f"Wrote {path} ({number}/{len(pages)})")
+    return outputs
+
+
+ATLAS_GAP = 2  # transparent pixels between packed crops, against filter bleed
+
+
+def pack_shelves(sizes: List[Tuple[int, int]], max_width: int, gap: int = ATLAS_GAP) -> Tuple[List[Tuple[int, int]], int, int]:
+    """Place rectangles of *sizes* left to right in rows ("shelves").
+
+    A new shelf starts whenever the next rectangle would exceed *max_width*.
+    Returns the top-left corner of each rectangle and the atlas size.
+    """
+    positions = []
+    x = y = shelf_height = width = 0
+    for w, h in sizes:
+        if x and x + w > max_width:
+            x, y, shelf_height = 0, y + shelf_height + gap, 0
+        positions.append((x, y))
+        x += w + gap
+        width = max(width, x - gap)
+        shelf_height = max(shelf_height, h)
+    return positions, width, y + shelf_height
+
+
+def atlas_path(output_dir: Path, stem: str, settings: Settings | None = None) -> Path:
+    """Image path of the variant atlas for *stem*."""
+    return output_dir / f"{stem}_atlas{output_suffix(settings)}"
+
+
+def render_atlas(
+    sentence: str,
+    phrase: str | List[str],
+    variants: List[Variant],
+    output_dir: Path,
+    stem: str,
+    *,
+    quiet: bool = False,
+    settings: Settings | None = None,
+) -> Path:
+    """Render all *variants* cropped into one atlas image; return its path.
+
+    The `.json` sidecar indexes every variant by suffix: its rectangle in the
+    atlas (``x``, ``y``, ``width``, ``height``) and where that crop sits on the
+    full canvas (``canvas_x``, ``canvas_y``).  The atlas bypasses the render
+    cache.
+    """
+    s = settings or core.SETTINGS
+    session = get_session(s.canvas_width, s.canvas_height)
+    crops = []
+    for suffix, extra_attrs, color in variants:
+        with span("markup"):
+            markup = variant_markup(sentence, phrase, extra_attrs, color, s)
+        crops.append((suffix, *session.draw_cropped(
+            markup, wrap_width=s.wrap_width, background=s.background_rgba, padding=s.crop_padding
+        )))
+
+    positions, width, height = pack_shelves(
+        [(p["width"], p["height"]) for _, _, p in crops], s.canvas_width  # type: ignore[misc]
+    )
+    index: Dict[str, object] = {
+        "canvas_width": s.canvas_width,
+        "canvas_height": s.canvas_height,
+        "background_rgba": list(s.background_rgba),
+        "width": max(1, width),
+        "height": max(1, height),
+        "variants": {},
+    }
+    with span("atlas.pack", variants=len(crops)):
+        atlas = cairo.ImageSurface(cairo.FORMAT_ARGB32, max(1, width), max(1, height))
+        ctx = cairo.Context(atlas)
+        ctx.set_operator(cairo.OPERATOR_SOURCE)  # copy crops (and their background) verbatim
+        for (suffix, surface, placement), (x, y) in zip(crops, positions):
+            ctx.set_source_surface(surface, x, y)
+            ctx.rectangle(x, y, placement["width"], placement["height"])
+            ctx.fill()
+            index["variants"][suffix] = {  # type: ignore[index]
+                "x": x,
+                "y": y,
+                "width": placement["width"],
+                "height": placement["height"],
+                "canvas_x": placement["x"],
+                "canvas_y": placement["y"],
+            }
+        atlas.flush()
+    _note_surfaces(
+        session.surface_bytes
+        + atlas.get_stride() * atlas.get_height()
+        + sum(surface.get_stride() * surface.get_height() for _, surface, _ in crops)
+    )
 
-    ctx.set_source_rgba(*BACKGROUND_RGBA)
-    ctx.paint()
+    output = atlas_path(output_dir, stem, s)
+    write_image(atlas, output, index, s)
+    if not quiet:
+        print(f"Wrote {output} ({len(crops)} variants, {width}x{height})")
+    return output
 
-    layout = PangoCairo.create_layout(ctx)
-    layout.set_width(WRAP_WIDTH * Pango.SCALE)
-    layout.set_wrap(Pango.WrapMode.WORD_CHAR)
-    layout.set_markup(markup, -1)
 
-    _, logical = layout.get_pixel_extents()
-    ctx.translate((CANVAS_WIDTH-logical.width)/2, (CANVAS_HEIGHT-logical.height)/2)
+# ---------------------------------------------------------------------------
 
-    PangoCairo.show_layout(ctx, layout)
-    surface.write_to_png(str(output))
-    print(f"Wrote {output}")
+def render_variants(
+    sentence: str,
+    phrase: str | List[str],
+    variants: List[Variant],
+    output_dir: Path,
+    stem: str,
+    *,
+    quiet: bool = False,
+    settings: Settings | None = None,
+) -> List[Path]:
+    """Render every variant of *sentence* into *output_dir*; return the image paths.
+
+    *phrase* may be a list of phrases, in which case every occurrence of each
+    is highlighted (see `make_multi_markup`).  With `paginate: true` each
+    variant contributes one path per page; with `atlas_output: true` the
+    single atlas path is returned.
+    """
+    s = settings or core.SETTINGS
+    if s.atlas_output:
+        return [render_atlas(sentence, phrase, variants, output_dir, stem, quiet=quiet, settings=s)]
+    dirty = highlight_byte_ranges(sentence, phrase)
+    outputs = []
+    for suffix, extra_attrs, color in variants:
+        with span("markup"):
+            markup = variant_markup(sentence, phrase, extra_attrs, color, s)
+        output = output_dir / f"{stem}_{suffix}{output_suffix(s)}"
+        if s.paginate:
+            outputs += render_pages(markup, output, quiet=quiet, settings=s)
+            continue
+        render(markup, output, quiet=quiet, dirty=dirty, settings=s)
+        outputs.append(output)
+    return outputs
 
 
 # ---------------------------------------------------------------------------
@@ -170,74 +886,22 @@ def render(markup: str, output: Path) -> None:
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--sentence")
-    ap.add_argument("--highlight")
+    ap.add_argument("--highlight", action="append", help="phrase to highlight; repeat to highlight several (all occurrences)")
     ap.add_argument("--basename", default="demo")
     ap.add_argument("--config", default="config.yml", help="YAML configuration file")
+    ap.add_argument("--trace", help="write a Chrome trace of every stage to this JSON file")
     args = ap.parse_args()
+    if args.trace:
+        tracing.enable()
 
-    # Load configuration --------------------------------------------------
-    cfg_path = Path(args.config)
-    if cfg_path.exists():
-        with cfg_path.open() as f:
-            cfg = yaml.safe_load(f) or {}
-    else:
-        cfg = {}
-
-    # Apply config overrides to globals -----------------------------------
-    global CANVAS_WIDTH, CANVAS_HEIGHT, WRAP_RATIO, WRAP_WIDTH
-    global BACKGROUND_RGBA, TEXT_COLOR, DEFAULT_HIGHLIGHT_COLOR
-    global BASE_FONT_FAMILY, BASE_FONT_SIZE_PT
-
-    CANVAS_WIDTH = cfg.get("canvas_width", CANVAS_WIDTH)
-    CANVAS_HEIGHT = cfg.get("canvas_height", CANVAS_HEIGHT)
-    WRAP_RATIO = cfg.get("wrap_ratio", WRAP_RATIO)
-    WRAP_WIDTH = int(CANVAS_WIDTH * WRAP_RATIO)
-
-    # --- Background colour --------------------------------------------------
-    if "background_color_hsla" in cfg:
-        BACKGROUND_RGBA = hsla_to_rgba(tuple(cfg["background_color_hsla"]))  # type: ignore[arg-type]
-    elif "background_color" in cfg:
-        # legacy RGB without alpha → opaque background
-        rgb = cfg["background_color"]
-        BACKGROUND_RGBA = (rgb[0], rgb[1], rgb[2], 1.0)
-
-    # --- Text colour --------------------------------------------------------
-    if "text_color_hsla" in cfg:
-        TEXT_COLOR = hsla_to_rgba(tuple(cfg["text_color_hsla"]))[:3]  # strip alpha → RGB
-    else:
-        TEXT_COLOR = tuple(cfg.get("text_color", TEXT_COLOR))  # type: ignore[arg-type]
-
-    # --- Highlight colour ---------------------------------------------------
-    if "default_highlight_color_hsla" in cfg:
-        DEFAULT_HIGHLIGHT_COLOR = hsla_to_rgba(tuple(cfg["default_highlight_color_hsla"]))[:3]
-    else:
-        DEFAULT_HIGHLIGHT_COLOR = tuple(cfg.get("default_highlight_color", DEFAULT_HIGHLIGHT_COLOR))  # type: ignore[arg-type]
-    BASE_FONT_FAMILY = cfg.get("base_font_family", BASE_FONT_FAMILY)
-    BASE_FONT_SIZE_PT = cfg.get("base_font_size_pt", BASE_FONT_SIZE_PT)
-
-    COLOR_VARIANT_COLOR = tuple(cfg.get("color_variant_color", (0.0, 0.6, 1.0)))  # type: ignore[arg-type]
-    SIZE_VARIANT_FACTOR = cfg.get("size_variant_factor", 1.4)
-
-    FAMILY_VARIANT_FONT = cfg.get("family_variant_font_family", "Courier New")
-    WEIGHT_VARIANT_WEIGHT = cfg.get("weight_variant_weight", "bold")
-    STYLE_VARIANT_STYLE = cfg.get("style_variant_style", "italic")
-    UNDERLINE_VARIANT_UNDERLINE = cfg.get("underline_variant_underline", "single")
-    STRIKE_VARIANT_STRIKETHROUGH = cfg.get("strike_variant_strikethrough", "true")
-    RISE_VARIANT_RISE = cfg.get("rise_variant_rise", 10000)
-
-    # Determine output directory -----------------------------------------
-    output_root = Path(cfg.get("output_dir", "output"))
-    mode = cfg.get("output_dir_mode", "timestamped")
-    if mode == "timestamped":
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_dir = output_root / timestamp
-    else:
-        output_dir = output_root
-    output_dir.mkdir(parents=True, exist_ok=True)
+    cfg = load_config(args.config)
+    settings = apply_config(cfg)
+    output_dir = resolve_output_dir(cfg)
 
     # Sentence / highlight ------------------------------------------------
     if args.sentence and args.highlight:
-        sent, phrase = args.sentence, args.highlight
+        sent = args.sentence
+        phrase = args.highlight[0] if len(args.highlight) == 1 else args.highlight
     else:
         text_cfg = cfg.get("text") or {}
         sent = text_cfg.get("base")
@@ -246,30 +910,11 @@ def main() -> None:
             ap.error("Provide --sentence/--highlight or set text.base and text.highlight in config.yaml")
     stem = Path(args.basename).stem
 
-    # Variants ------------------------------------------------------------
-    variants_cfg = cfg.get("variants")
-    if variants_cfg:
-        variants = []
-        for suffix, detail in variants_cfg.items():
-            extra_attrs = detail.get("extra_attrs", {})
-            color = tuple(detail.get("highlight_color", DEFAULT_HIGHLIGHT_COLOR))  # type: ignore[arg-type]
-            variants.append((suffix, extra_attrs, color))
-    else:
-        variants = [
-            ("color", {}, COLOR_VARIANT_COLOR),
-            ("size", {"size": str(int(BASE_FONT_SIZE_PT * SIZE_VARIANT_FACTOR * 1024))}, DEFAULT_HIGHLIGHT_COLOR),
-            ("family", {"font_family": FAMILY_VARIANT_FONT}, DEFAULT_HIGHLIGHT_COLOR),
-            ("weight", {"weight": WEIGHT_VARIANT_WEIGHT}, DEFAULT_HIGHLIGHT_COLOR),
-            ("style", {"style": STYLE_VARIANT_STYLE}, DEFAULT_HIGHLIGHT_COLOR),
-            ("underline", {"underline": UNDERLINE_VARIANT_UNDERLINE}, DEFAULT_HIGHLIGHT_COLOR),
-            ("strike", {"strikethrough": STRIKE_VARIANT_STRIKETHROUGH}, DEFAULT_HIGHLIGHT_COLOR),
-            ("rise", {"rise": str(RISE_VARIANT_RISE)}, DEFAULT_HIGHLIGHT_COLOR),
-        ]
-
-    # Render --------------------------------------------------------------
-    for suffix, extra_attrs, color in variants:
-        markup = make_markup(sent, phrase, extra_attrs=extra_attrs, highlight_color=color)
-        render(markup, output_dir / f"{stem}_{suffix}.png")
+    render_variants(sent, phrase, build_variants(cfg.get("variants"), settings), output_dir, stem, settings=settings)
+    print(f"Peak surface memory: {take_surface_peak() / 2**20:.1f} MiB")
+    if settings.render_cache is not None:
+        print("Render cache:", ", ".join(f"{k}={v}" for k, v in settings.render_cache.stats().items()))
+    tracing.finish(args.trace)
 
 
 if __name__ == "__main__":
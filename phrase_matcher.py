@@ -0,0 +1,104 @@
+"""Single-pass multi-phrase matcher (Aho-Corasick) for highlight markup.
+
+`PhraseMatcher` compiles any number of phrases into one automaton and finds
+every occurrence of all of them in a single left-to-right scan of the text,
+so highlighting hundreds of glossary terms costs one pass instead of one
+`str.find` loop per term.
+
+Overlaps are resolved leftmost-longest: among matches starting at the same
+position the longest wins, ties go to the phrase listed first, and a match is
+dropped if it overlaps one already selected further left.  With
+``whole_words=True`` only matches not embedded in a longer word count.
+"""
+from __future__ import annotations
+
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple
+
+
+class Match(NamedTuple):
+    """Occurrence of ``phrases[index]`` at ``text[start:end]``."""
+
+    start: int
+    end: int
+    index: int
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over *phrases* (matched case-sensitively)."""
+
+    def __init__(self, phrases: Iterable[str], *, whole_words: bool = False) -> None:
+        self.phrases = list(phrases)
+        self.whole_words = whole_words
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[int] = [-1]   # phrase ending exactly at this node
+        self._link: List[int] = [0]   # nearest proper suffix node with an output
+
+        for index, phrase in enumerate(self.phrases):
+            if not phrase:
+                raise ValueError("highlight phrases must not be empty")
+            node = 0
+            for ch in phrase:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(-1)
+                    self._link.append(0)
+                node = nxt
+            if self._out[node] == -1:  # duplicates: the first listing wins
+                self._out[node] = index
+
+        # Breadth-first failure links, so a node's suffix links are final
+        # before its children are processed.
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                fallback = self._fail[child]
+                self._link[child] = fallback if self._out[fallback] != -1 else self._link[fallback]
+
+    def find_all(self, text: str) -> List[Match]:
+        """Every (possibly overlapping) occurrence, ordered by end position."""
+        goto, fail, out, link, phrases = self._goto, self._fail, self._out, self._link, self.phrases
+        matches: List[Match] = []
+        node = 0
+        for pos, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            hit = node if out[node] != -1 else link[node]
+            while hit:
+                index = out[hit]
+                end = pos + 1
+                start = end - len(phrases[index])
+                if not self.whole_words or _is_word_bounded(text, start, end):
+                    matches.append(Match(start, end, index))
+                hit = link[hit]
+        return matches
+
+    def find(self, text: str) -> List[Match]:
+        """Non-overlapping matches chosen leftmost-longest, in text order."""
+        ranked = sorted(self.find_all(text), key=lambda m: (m.start, m.start - m.end, m.index))
+        selected: List[Match] = []
+        pos = 0
+        for match in ranked:
+            if match.start >= pos:
+                selected.append(match)
+                pos = match.end
+        return selected
+
+
+def _is_word_bounded(text: str, start: int, end: int) -> bool:
+    before = text[start - 1] if start > 0 else ""
+    after = text[end] if end < len(text) else ""
+    return not (before.isalnum() and text[start].isalnum()) and not (after.isalnum() and text[end - 1].isalnum())
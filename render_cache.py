@@ -0,0 +1,157 @@
+"""Content-addressed on-disk cache for rendered PNGs.
+
+Entries are keyed by a SHA-256 over everything that affects the pixels (the
+markup from `make_markup`, canvas size, wrap width, background RGBA, resolved
+fonts, ...).  A hit is served by hardlinking the cached file to the requested
+output path, falling back to a copy across filesystems.  The cache is bounded
+by total size and evicts least-recently-used entries; hits refresh an entry's
+mtime so the policy works across processes sharing the directory.  Stores keep
+a running size total and only scan the directory once it exceeds the bound
+(or every `RESCAN_EVERY` stores, to pick up other processes' writes).
+
+Layout on disk:  <root>/<key[:2]>/<key><suffix>  (the image, e.g. `.png` or
+`.raw`, plus the optional `.json` sidecar of cropped or raw renders).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+
+RESCAN_EVERY = 256  # stores between full scans even when under the bound
+
+
+def cache_key(**parts: object) -> str:
+    """Stable hash of JSON-serialisable *parts*."""
+    blob = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=list)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+class RenderCache:
+    """Size-bounded LRU cache of render outputs under *root*."""
+
+    def __init__(self, root: str | Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._size: int | None = None  # running total; None until the first scan
+        self._stores = 0
+        # Guards the counters and size total: batch_render --threads shares
+        # one cache between threads.  Held through eviction scans.
+        self._lock = threading.Lock()
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def fetch(self, key: str, dest: Path, suffixes: Iterable[str] = (".json",)) -> bool:
+        """Materialise entry *key* at *dest*; return False on a miss.
+
+        Extra files stored with the entry (e.g. `.json`) are placed next to
+        *dest* with the same stem; those the entry lacks are removed there, so
+        no stale sidecar outlives a hit.
+        """
+        primary = self._path(key, dest.suffix)
+        try:
+            _link_or_copy(primary, dest)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return False
+        for suffix in suffixes:
+            extra = self._path(key, suffix)
+            if extra.exists():
+                _link_or_copy(extra, dest.with_suffix(suffix))
+            else:
+                dest.with_suffix(suffix).unlink(missing_ok=True)
+        try:
+            os.utime(primary)  # LRU: mark as recently used
+        except FileNotFoundError:
+            pass  # evicted concurrently; we already have our copy
+        with self._lock:
+            self.hits += 1
+        return True
+
+    def store(self, key: str, files: List[Path]) -> None:
+        """Add *files* (the primary image first) to the cache under *key*."""
+        entry_dir = self._path(key, "").parent
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        # Write extras before the primary file so a visible entry is complete.
+        added = 0
+        for src in [*files[1:], files[0]]:
+            fd, tmp = tempfile.mkstemp(dir=entry_dir, prefix=".store-")
+            os.close(fd)
+            shutil.copyfile(src, tmp)
+            dest = self._path(key, src.suffix)
+            try:
+                added -= dest.stat().st_size  # replacing an existing file
+            except FileNotFoundError:
+                pass
+            added += os.path.getsize(tmp)
+            os.replace(tmp, dest)
+        with self._lock:
+            self._stores += 1
+            rescan = self._size is None or self._stores % RESCAN_EVERY == 0
+            if not rescan:
+                self._size += added  # type: ignore[operator]
+                rescan = self._size > self.max_bytes  # type: ignore[operator]
+        if rescan:
+            self.evict()
+
+    def _entries(self) -> Dict[str, List[Path]]:
+        entries: Dict[str, List[Path]] = {}
+        for path in self.root.glob("??/*"):
+            if path.name.startswith("."):
+                continue
+            entries.setdefault(path.name.split(".", 1)[0], []).append(path)
+        return entries
+
+    def evict(self) -> None:
+        """Delete least-recently-used entries until the cache fits *max_bytes*."""
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        sized = []
+        total = 0
+        for key, paths in self._entries().items():
+            try:
+                stats = [p.stat() for p in paths]
+            except FileNotFoundError:
+                continue  # half-written or concurrently evicted
+            size = sum(st.st_size for st in stats)
+            used = max(st.st_mtime for st in stats)  # hits touch the image file
+            sized.append((used, size, paths))
+            total += size
+        for _, size, paths in sorted(sized, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            for path in paths:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+            total -= size
+            self.evictions += 1
+        self._size = total
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""Long-running render server: pay the startup cost once, render on request.
+
+A CLI run of `pango_feature_demos.py` spends most of a preview render on
+interpreter start, gi typelib loading, the fontconfig scan and config
+parsing.  This daemon does all of that once, warms one render session per
+worker thread and then serves renders over localhost HTTP or a Unix socket.
+
+Endpoints (JSON request/response bodies):
+
+  • POST /render  – ``{"sentence", "highlight", ...}``; `highlight` may be a
+                    list.  Pick a configured variant with ``"variant"`` (default:
+                    the first) or pass ``"attrs"`` (an object of Pango span
+                    attributes) and ``"color"`` ([r, g, b], 0-1) directly;
+                    ``"format"`` overrides `output_format`.  Returns the image bytes (sidecar metadata,
+                    if any, in the ``X-Image-Meta`` header) or, with ``"output"``
+                    (a path inside the output directory), writes the file and
+                    returns ``{"path", "render_ms"}``.
+  • GET /health   – liveness and pool size
+  • GET /metrics  – request counters, in-flight renders and latency percentiles
+
+At most ``--workers`` renders run at once and ``--queue`` more may wait; any
+request beyond that is answered ``503`` immediately instead of piling up.
+
+Usage example:
+  python3 render_daemon.py --port 8765 --workers 4
+  curl -s localhost:8765/render -d '{"sentence": "Growth comes from stepping out of the comfort zone.",
+                                     "highlight": "comfort zone", "variant": "weight"}' > preview.png
+  python3 render_daemon.py --socket /tmp/render.sock
+  curl -s --unix-socket /tmp/render.sock http://localhost/metrics
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import os
+import re
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from html import escape
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import pango_feature_demos as pfd
+
+MAX_BODY_BYTES = 1 << 20
+
+
+class RenderJob(NamedTuple):
+    """A validated /render request."""
+
+    markup: str
+    dirty: List[Tuple[int, int]]
+    settings: pfd.Settings
+    output: Path | None
+
+
+_ATTR_NAME_RE = re.compile(r"[a-z_]+")
+
+
+def _span_attrs(attrs: object) -> Dict[str, str]:
+    """Pango span attributes from a request, names checked and values escaped."""
+    if not isinstance(attrs, dict) or not all(isinstance(v, str) for v in attrs.values()):
+        raise ValueError("'attrs' must be an object of string attribute values")
+    bad = [k for k in attrs if not _ATTR_NAME_RE.fullmatch(k)]
+    if bad:
+        raise ValueError(f"invalid span attribute name(s): {', '.join(map(repr, bad))}")
+    return {k: escape(v) for k, v in attrs.items()}
+
+
+def build_job(payload: dict, variants: Dict[str, pfd.Variant], settings: pfd.Settings, output_root: Path) -> RenderJob:
+    """Validate a /render body; raise ValueError with a client-facing message."""
+    sentence, phrase = payload.get("sentence"), payload.get("highlight")
+    if not (isinstance(sentence, str) and sentence):
+        raise ValueError("'sentence' must be a non-empty string")
+    phrases = phrase if isinstance(phrase, list) else [phrase]
+    if not (phrases and all(isinstance(p, str) and p for p in phrases)):
+        raise ValueError("'highlight' must be a non-empty string or list of strings")
+
+    if "attrs" in payload or "color" in payload:
+        extra_attrs = _span_attrs(payload.get("attrs", {}))
+        color = tuple(float(c) for c in payload.get("color", settings.default_highlight_color))
+        if len(color) != 3:
+            raise ValueError("'color' must be [r, g, b]")
+    else:
+        name = payload.get("variant") or next(iter(variants), None)
+        if name not in variants:
+            raise ValueError(f"unknown variant {name!r}, one of: {', '.join(variants)}")
+        _, extra_attrs, color = variants[name]
+
+    if payload.get("format"):
+        settings = dataclasses.replace(settings, output_format=str(payload["format"]).lower())
+
+    output = None
+    if payload.get("output"):
+        root = output_root.resolve()
+        output = (root / str(payload["output"])).resolve().with_suffix(pfd.output_suffix(settings))
+        if root not in output.parents:
+            raise ValueError("'output' must stay inside the output directory")
+
+    markup = pfd.variant_markup(sentence, phrase, extra_attrs, color, settings)  # type: ignore[arg-type]
+    return RenderJob(markup, pfd.highlight_byte_ranges(sentence, phrase), settings, output)  # type: ignore[arg-type]
+
+
+def run_job(job: RenderJob) -> Tuple[bytes | None, Dict[str, object]]:
+    """Render *job* on the calling pool thread (and its warm session).
+
+    Returns ``(image bytes, sidecar metadata)``, or ``(None, {})`` when the
+    image was written to ``job.output``.
+    """
+    if job.output is not None:
+        job.output.parent.mkdir(parents=True, exist_ok=True)
+        pfd.render(job.markup, job.output, quiet=True, dirty=job.dirty, settings=job.settings)
+        return None, {}
+    return pfd.render_bytes(job.markup, dirty=job.dirty, settings=job.settings)
+
+
+class Metrics:
+    """Thread-safe request counters and a window of recent render latencies."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._latencies: deque[float] = deque(maxlen=window)
+        self.started = time.time()
+        self.in_flight = 0
+        self.counts = {"requests": 0, "rendered": 0, "bad_request": 0, "rejected": 0, "timeouts": 0, "failed": 0}
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self.counts[key] += 1
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self.counts["rendered"] += 1
+            self._latencies.append(seconds)
+
+    def add_in_flight(self, delta: int) -> None:
+        with self._lock:
+            self.in_flight += delta
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            snap: Dict[str, object] = {
+                **self.counts,
+                "in_flight": self.in_flight,
+                "uptime_s": round(time.time() - self.started, 3),
+            }
+        if latencies:
+            # nearest-rank percentiles over the window
+            pick = lambda q: round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1e3, 3)  # noqa: E731
+            snap["latency_ms"] = {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": pick(1.0)}
+        return snap
+
+
+class RenderDaemon:
+    """Render pool, admission control and metrics shared by all connections."""
+
+    def __init__(
+        self,
+        settings: pfd.Settings,
+        variants: List[pfd.Variant],
+        output_root: Path,
+        *,
+        workers: int,
+        queue: int,
+        timeout: float,
+        quiet: bool = False,
+    ) -> None:
+        self.settings = settings
+        self.variants = {v[0]: v for v in variants}
+        self.output_root = output_root
+        self.workers = workers
+        self.timeout = timeout
+        self.quiet = quiet
+        self.metrics = Metrics()
+        # Fixed threads: render sessions are per thread, so they stay warm.
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="render")
+        self._slots = threading.BoundedSemaphore(workers + queue)
+
+    def warm_up(self) -> None:
+        """Load the backend and fonts and build a session on every worker."""
+        job = build_job({"sentence": "Warm-up render", "highlight": "render"}, self.variants, self.settings, self.output_root)
+        barrier = threading.Barrier(self.workers)
+
+        def warm() -> None:
+            run_job(job)
+            barrier.wait(timeout=60)  # hold this thread so the next task lands on another
+
+        for future in [self.pool.submit(warm) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self) -> None:
+        self.pool.shutdown(wait=True)
+
+    def health(self) -> Dict[str, object]:
+        return {"status": "ok", "workers": self.workers, "pid": os.getpid()}
+
+    def metrics_snapshot(self) -> Dict[str, object]:
+        snap = self.metrics.snapshot()
+        if self.settings.render_cache is not None:
+            snap["render_cache"] = self.settings.render_cache.stats()
+        return snap
+
+    def _release(self, _future: object) -> None:
+        self.metrics.add_in_flight(-1)
+        self._slots.release()
+
+    def handle_render(self, payload: object) -> Tuple[int, Dict[str, str], bytes]:
+        """Serve one /render request; returns ``(status, headers, body)``."""
+        self.metrics.count("requests")
+        try:
+            if not isinstance(payload, dict):
+                raise ValueError("request body must be a JSON object")
+            job = build_job(payload, self.variants, self.settings, self.output_root)
+        except (ValueError, TypeError) as exc:
+            self.metrics.count("bad_request")
+            return _json(400, {"error": str(exc)})
+
+        if not self._slots.acquire(blocking=False):
+            self.metrics.count("rejected")
+            status, headers, body = _json(503, {"error": "render queue full"})
+            return status, {**headers, "Retry-After": "1"}, body
+        self.metrics.add_in_flight(1)
+        start = time.perf_counter()
+        try:
+            future = self.pool.submit(run_job, job)
+        except RuntimeError:  # pool shut down
+            self._release(None)
+            return _json(503, {"error": "shutting down"})
+        # The slot is held until the render really finishes, even after a timeout.
+        future.add_done_callback(self._release)
+        try:
+            image, meta = future.result(timeout=self.timeout)
+        except FutureTimeout:
+            self.metrics.count("timeouts")
+            return _json(504, {"error": f"render took longer than {self.timeout}s"})
+        except Exception as exc:  # noqa: BLE001 – report, keep serving
+            self.metrics.count("failed")
+            return _json(500, {"error": f"{type(exc).__name__}: {exc}"})
+        seconds = time.perf_counter() - start
+        self.metrics.observe(seconds)
+
+        render_ms = f"{seconds * 1e3:.3f}"
+        if image is None:
+            return _json(200, {"path": str(job.output), "render_ms": float(render_ms)})
+        headers = {
+            "Content-Type": "image/png" if job.settings.output_format == "png" else "application/octet-stream",
+            "X-Render-Ms": render_ms,
+        }
+        if meta:
+            headers["X-Image-Meta"] = json.dumps(meta, separators=(",", ":"))
+        return 200, headers, image
+
+
+def _json(status: int, obj: object) -> Tuple[int, Dict[str, str], bytes]:
+    return status, {"Content-Type": "application/json"}, json.dumps(obj).encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "render-daemon/1"
+    protocol_version = "HTTP/1.1"  # keep-alive: no reconnect per preview
+
+    def _send(self, status: int, headers: Dict[str, str], body: bytes) -> None:
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:  # noqa: N802
+        app: RenderDaemon = self.server.app  # type: ignore[attr-defined]
+        if self.path == "/health":
+            self._send(*_json(200, app.health()))
+        elif self.path == "/metrics":
+            self._send(*_json(200, app.metrics_snapshot()))
+        else:
+            self._send(*_json(404, {"error": f"no such endpoint: {self.path}"}))
+
+    def do_POST(self) -> None:  # noqa: N802
+        app: RenderDaemon = self.server.app  # type: ignore[attr-defined]
+        if self.path != "/render":
+            self._send(*_json(404, {"error": f"no such endpoint: {self.path}"}))
+            return
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True  # the body's extent is unknown
+            self._send(*_json(400, {"error": "invalid Content-Length"}))
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self._send(*_json(413, {"error": "request body too large"}))
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as exc:
+            self._send(*_json(400, {"error": f"invalid JSON: {exc}"}))
+            return
+        self._send(*app.handle_render(payload))
+
+    def address_string(self) -> str:
+        # Unix-socket peers have no (host, port) address.
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format: str, *args: object) -> None:  # noqa: A002
+        if not self.server.app.quiet:  # type: ignore[attr-defined]
+            super().log_message(format, *args)
+
+
+class _TCPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def make_server(
+    app: RenderDaemon, *, host: str = "127.0.0.1", port: int = 8765, socket_path: str | None = None
+) -> socketserver.BaseServer:
+    """HTTP server for *app* on a Unix socket (if given) or *host*:*port*."""
+    if socket_path:
+        Path(socket_path).unlink(missing_ok=True)  # stale socket from a previous run
+        server: socketserver.BaseServer = _UnixServer(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+    else:
+        server = _TCPServer((host, port), _Handler)
+    server.app = app  # type: ignore[attr-defined]
+    return server
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--config", default="config.yml", help="YAML configuration file")
+    ap.add_argument("--host", default="127.0.0.1", help="interface for HTTP (default: localhost only)")
+    ap.add_argument("--port", type=int, default=8765, help="HTTP port")
+    ap.add_argument("--socket", help="serve on this Unix socket instead of TCP")
+    ap.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="concurrent renders")
+    ap.add_argument("--queue", type=int, default=16, help="requests allowed to wait for a worker before 503")
+    ap.add_argument("--timeout", type=float, default=10.0, help="seconds before a request gets 504")
+    ap.add_argument("--output-dir", help="root for 'output' paths (default: output_dir from the config)")
+    ap.add_argument("--quiet", action="store_true", help="no per-request access log")
+    args = ap.parse_args()
+
+    cfg = pfd.load_config(args.config)
+    settings = pfd.apply_config(cfg)
+    if settings.paginate or settings.atlas_output:
+        ap.error("paginate and atlas_output are not supported by the daemon")
+    app = RenderDaemon(
+        settings,
+        pfd.build_variants(cfg.get("variants"), settings),
+        Path(args.output_dir or cfg.get("output_dir", "output")),
+        workers=max(1, args.workers),
+        queue=max(0, args.queue),
+        timeout=args.timeout,
+        quiet=args.quiet,
+    )
+    start = time.perf_counter()
+    app.warm_up()
+    server = make_server(app, host=args.host, port=args.port, socket_path=args.socket)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"  # type: ignore[attr-defined]
+    print(f"Serving renders on {where} ({app.workers} workers, warm-up {time.perf_counter() - start:.2f}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down", file=sys.stderr)
+    finally:
+        server.server_close()
+        app.close()
+        if args.socket:
+            Path(args.socket).unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import asyncio
+import sys
+
+import pytest
+
+import async_pipeline
+import video_pipeline as vp
+
+
+def test_encode_reports_ffmpeg_exiting_mid_stream(tmp_path, monkeypatch):
+    # A stand-in encoder that exits without reading its 8 MiB of stdin.
+    monkeypatch.setattr(vp, "build_rawvideo_command", lambda *args: [sys.executable, "-c", "raise SystemExit(3)"])
+    frame = async_pipeline.Frame({"output_video": str(tmp_path / "out.webm")}, b"\0" * (8 << 20), 2048, 1024, "bgra")
+    with pytest.raises(RuntimeError, match="exited with 3"):
+        asyncio.run(async_pipeline._encode(frame, force=True))
+
+
+def test_encoders_sized_by_variants_not_jobs():
+    from highlight_core import Settings, build_variants
+
+    settings = Settings()
+    variants = build_variants(settings=settings)
+    job = {"sentence": "a b", "highlight": "b"}
+    jobs = [job, {**job, "variants": "color"}, {**job, "variants": "sparkle"}]
+    assert async_pipeline.count_encodes(jobs, variants, settings) == len(variants) + 1
+    encoders, _ = vp.plan_threads(async_pipeline.count_encodes(jobs[:1], variants, settings), 32)
+    assert encoders == min(len(variants), 8)  # one job, still one encoder per variant
@@ -0,0 +1,23 @@
+import math
+
+from fade_frames import alpha_schedule
+
+
+def test_alpha_schedule_frame_counts():
+    cfg = {"fps": 10, "total_duration": 3, "fade_in_duration": 0.5, "fade_out_duration": 1}
+    alphas = alpha_schedule(cfg)
+    assert len(alphas) == 30
+    assert alphas[0] == 0.0
+    assert alphas[5:20] == [1.0] * 15
+    assert math.isclose(alphas[-1], 0.0, abs_tol=1e-9)
+
+
+def test_alpha_schedule_easing_curves():
+    base = {"fps": 4, "total_duration": 2, "fade_in_duration": 1, "fade_out_duration": 1}
+    linear = alpha_schedule({**base, "easing_in": "linear"})
+    eased = alpha_schedule({**base, "easing_in": "easein", "easing_out": "easeout"})
+    assert math.isclose(linear[2], 0.5)
+    # ease-in-sine starts slower than linear ...
+    assert eased[2] < linear[2]
+    # ... and the fade-out follows 1 - sin(t·π/2)
+    assert math.isclose(eased[4], 1 - math.sin(0.25 * math.pi / 2))
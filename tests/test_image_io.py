@@ -0,0 +1,105 @@
+import json
+import struct
+import sys
+import zlib
+
+import pytest
+
+from image_io import RAW_PIX_FMT, PngStream, RawStream, image_size, load_raw_meta, write_png, write_raw
+
+
+def _pixel(a, r, g, b):
+    """One premultiplied ARGB32 pixel in native byte order."""
+    return bytes((b, g, r, a)) if sys.byteorder == "little" else bytes((a, r, g, b))
+
+
+def test_write_raw_drops_row_padding(tmp_path):
+    stride = 12  # two pixels + 4 bytes of padding per row
+    data = (_pixel(255, 1, 2, 3) + _pixel(0, 0, 0, 0) + b"pad!") * 3
+    out = tmp_path / "frame.raw"
+    meta = write_raw(out, data, 2, 3, stride)
+    assert out.read_bytes() == (_pixel(255, 1, 2, 3) + _pixel(0, 0, 0, 0)) * 3
+    assert meta == {"format": "rawvideo", "pix_fmt": RAW_PIX_FMT, "width": 2, "height": 3, "premultiplied": True}
+
+
+def test_load_raw_meta_needs_sidecar(tmp_path):
+    assert load_raw_meta(tmp_path / "frame.png") is None
+    frame = tmp_path / "frame.raw"
+    with pytest.raises(FileNotFoundError):
+        load_raw_meta(frame)
+    frame.with_suffix(".json").write_text(json.dumps({"format": "rawvideo", "width": 2, "height": 3}))
+    assert load_raw_meta(frame)["width"] == 2
+
+
+@pytest.mark.parametrize("level", [0, 1, 9])
+def test_write_png_unpremultiplies(tmp_path, level):
+    pytest.importorskip("numpy")
+    data = _pixel(255, 10, 20, 30) + _pixel(128, 64, 0, 128) + _pixel(0, 0, 0, 0)
+    out = tmp_path / "frame.png"
+    write_png(out, data, 3, 1, 12, level)
+
+    blob = out.read_bytes()
+    assert blob[:8] == b"\x89PNG\r\n\x1a\n"
+    assert struct.unpack(">IIBB", blob[16:26]) == (3, 1, 8, 6)
+    idat = blob.index(b"IDAT")
+    (length,) = struct.unpack(">I", blob[idat - 4:idat])
+    rows = zlib.decompress(blob[idat + 4:idat + 4 + length])
+    assert rows == b"\x00" + bytes((10, 20, 30, 255, 128, 0, 255, 128, 0, 0, 0, 0))
+
+
+def test_image_size_reads_ihdr_and_raw_sidecar(tmp_path):
+    png = tmp_path / "frame.png"
+    png.write_bytes(b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 360) + b"\x08\x06\0\0\0")
+    assert image_size(png) == (640, 360)
+    png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    assert image_size(png) is None
+    raw = tmp_path / "frame.raw"
+    raw.write_bytes(b"")
+    raw.with_suffix(".json").write_text(json.dumps({"format": "rawvideo", "width": 2, "height": 3}))
+    assert image_size(raw) == (2, 3)
+
+
+def test_raw_stream_writes_strips_from_column_offset(tmp_path):
+    stride = 16  # x=1 skips the first pixel, 4 bytes of padding per row
+    rows = (_pixel(0, 0, 0, 0) + _pixel(255, 1, 2, 3) + _pixel(255, 4, 5, 6) + b"pad!") * 2
+    out = tmp_path / "frame.raw"
+    with RawStream(out, 2, 3) as stream:
+        stream.write_rows(rows, 2, stride, x=1)
+        stream.write_rows(rows, 1, stride, x=1)
+    assert out.read_bytes() == (_pixel(255, 1, 2, 3) + _pixel(255, 4, 5, 6)) * 3
+    assert stream.meta["width"] == 2 and stream.meta["height"] == 3
+
+
+def _png_pixels(path):
+    """Header and decompressed IDAT payload of the PNG at *path*."""
+    blob, pos, idat = path.read_bytes(), 8, b""
+    while pos < len(blob):
+        (length,) = struct.unpack(">I", blob[pos:pos + 4])
+        if blob[pos + 4:pos + 8] == b"IDAT":
+            idat += blob[pos + 8:pos + 8 + length]
+        pos += length + 12
+    return blob[16:29], zlib.decompress(idat)
+
+
+def test_png_stream_matches_write_png(tmp_path):
+    pytest.importorskip("numpy")
+    data = (_pixel(255, 10, 20, 30) + _pixel(128, 64, 0, 128)) * 4
+    whole, streamed = tmp_path / "whole.png", tmp_path / "streamed.png"
+    write_png(whole, data, 2, 4, 8, 6)
+    with PngStream(streamed, 2, 4, 6) as stream:
+        for _ in range(2):
+            stream.write_rows(data, 2, 8)
+    assert _png_pixels(streamed) == _png_pixels(whole)
+    with pytest.raises(ValueError):
+        with PngStream(tmp_path / "short.png", 2, 4) as stream:
+            stream.write_rows(data, 3, 8)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["streamed.png", "whole.png"]
+
+
+def test_failed_strip_render_leaves_no_partial_file(tmp_path):
+    out = tmp_path / "frame.raw"
+    with pytest.raises(RuntimeError):
+        with RawStream(out, 1, 4) as stream:
+            stream.write_rows(_pixel(255, 1, 2, 3), 1, 4)
+            raise RuntimeError("strip failed")
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY = ("cairo", "gi", "yaml")
+
+
+def _loaded_after(statement: str) -> set:
+    code = f"import sys; {statement}; print(' '.join(sorted(sys.modules)))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return set(out.stdout.split())
+
+
+def test_core_import_is_lightweight():
+    loaded = _loaded_after("import highlight_core")
+    assert not loaded & set(HEAVY)
+
+
+def test_renderer_defers_backend_until_render():
+    loaded = _loaded_after("import pango_feature_demos")
+    assert not loaded & set(HEAVY)
@@ -0,0 +1,83 @@
+from pathlib import Path
+
+import pytest
+
+from highlight_core import Settings, make_markup
+
+from pango_feature_demos import (
+    LineMetrics, base_markup, dirty_lines, highlight_byte_ranges, pack_shelves, page_path, split_pages, strip_rows,
+)
+
+
+def test_lines_fill_pages_in_order():
+    lines = [(i * 60, i * 60 + 60) for i in range(10)]
+    assert split_pages(lines, 200) == [(0, 3), (3, 6), (6, 9), (9, 10)]
+    assert split_pages(lines, 600) == [(0, 10)]
+
+
+def test_oversized_line_gets_own_page():
+    lines = [(0, 50), (50, 400), (400, 450)]
+    assert split_pages(lines, 100) == [(0, 1), (1, 2), (2, 3)]
+
+
+def test_no_lines_no_pages():
+    assert split_pages([], 100) == []
+
+
+def test_page_path_numbering():
+    assert page_path(Path("out/demo_color.png"), 7) == Path("out/demo_color_p007.png")
+
+
+def test_pack_shelves_wraps_at_max_width():
+    positions, width, height = pack_shelves([(800, 90), (820, 100), (700, 80)], 1920, gap=2)
+    assert positions == [(0, 0), (802, 0), (0, 102)]
+    assert (width, height) == (1622, 182)
+
+
+def test_dirty_lines_by_byte_range():
+    lines = [LineMetrics(0, 20, 0.0, 40.0, 0, 60, 5, 62), LineMetrics(20, 45, 0.0, 100.0, 60, 120, 65, 121)]
+    assert dirty_lines(lines, [(10, 15)]) == [0]
+    assert dirty_lines(lines, [(18, 25)]) == [0, 1]
+    assert dirty_lines(lines, [(45, 50)]) == []
+    assert dirty_lines(lines, []) == []
+
+
+def test_highlight_byte_ranges_are_utf8_offsets():
+    sentence = "Café au lait, café noir"
+    assert highlight_byte_ranges(sentence, "au lait") == [(6, 13)]
+    assert highlight_byte_ranges(sentence, ["café", "lait"]) == [(9, 13), (15, 20)]
+    assert highlight_byte_ranges(sentence, "tea") == []
+
+
+def test_strip_rows_fit_memory_budget():
+    assert strip_rows(Settings(canvas_width=7680, canvas_height=4320)) is None
+    raw = Settings(canvas_width=7680, canvas_height=4320, output_format="raw", memory_budget_mb=30)
+    assert strip_rows(raw) == 30 * 2**20 // (7680 * 4)
+    png = Settings(canvas_width=7680, canvas_height=4320, memory_budget_mb=30)
+    assert strip_rows(png) == 30 * 2**20 // (7680 * 4 * 6)
+    assert strip_rows(Settings(canvas_width=1920, canvas_height=1080, output_format="raw", memory_budget_mb=64)) is None
+
+
+def test_base_markup_ignores_highlight_but_not_base_style():
+    black = Settings(text_color=(0.0, 0.0, 0.0))
+    red = make_markup("a b c", "b", extra_attrs={"weight": "bold"}, highlight_color=(1, 0, 0), settings=black)
+    blue = make_markup("a b c", "b", extra_attrs={"style": "italic"}, highlight_color=(0, 0, 1), settings=black)
+    assert base_markup(red) == base_markup(blue)
+    white = Settings(text_color=(1.0, 1.0, 1.0))
+    assert base_markup(make_markup("a b c", "b", settings=white)) != base_markup(red)
+
+
+def test_incremental_base_not_shared_across_text_colours():
+    pytest.importorskip("cairo")
+    pytest.importorskip("gi")
+    from pango_feature_demos import RenderSession
+
+    session, reference = RenderSession(640, 360), RenderSession(640, 360)
+    background = (0.0, 0.0, 0.0, 0.0)
+    sentence, phrase = "Growth comes from the comfort zone.", "comfort zone"
+    dirty = highlight_byte_ranges(sentence, phrase)
+    for color in [(0.0, 0.0, 0.0), (0.2, 0.4, 1.0)]:
+        markup = make_markup(sentence, phrase, settings=Settings(text_color=color))
+        session.draw_incremental(markup, wrap_width=500, background=background, dirty=dirty)
+        reference.draw(markup, wrap_width=500, background=background)
+        assert bytes(session.surface.get_data()) == bytes(reference.surface.get_data())
@@ -0,0 +1,23 @@
+import shutil
+
+import pytest
+
+pytest.importorskip("manim")
+if shutil.which("ffmpeg") is None:
+    pytest.skip("manim needs ffmpeg to write clips", allow_module_level=True)
+
+import manim  # noqa: E402
+
+import image_io  # noqa: E402
+import manim_fade_scene  # noqa: E402
+
+
+def test_render_batch_renders_every_job_with_one_renderer(tmp_path):
+    png = tmp_path / "still.png"
+    png.write_bytes(image_io.encode_png(b"\xff\x80\x40\xff" * 16 * 16, 16, 16, 64, 1))
+    timing = {"total_duration": 0.5, "fade_in_duration": 0.1, "fade_out_duration": 0.1}
+    jobs = [{"png_path": str(png), "output_video": str(tmp_path / f"clip{i}.mp4"), **timing} for i in range(3)]
+    with manim.tempconfig({"quality": "low_quality", "media_dir": str(tmp_path / "media"), "disable_caching": True}):
+        results = manim_fade_scene.render_batch(jobs)
+    assert [r["error"] for r in results] == [None, None, None]
+    assert all((tmp_path / f"clip{i}.mp4").exists() for i in range(3))
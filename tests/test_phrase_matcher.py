@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from highlight_core import make_markup, make_multi_markup
+from phrase_matcher import Match, PhraseMatcher
+
+
+def test_finds_every_occurrence_of_every_phrase():
+    text = "she sells sea shells by the sea shore"
+    matcher = PhraseMatcher(["sea", "shells", "he"])
+    found = {(text[m.start:m.end], m.start) for m in matcher.find_all(text)}
+    assert found == {("he", 1), ("sea", 10), ("he", 15), ("shells", 14), ("he", 25), ("sea", 28)}
+
+
+def test_overlaps_resolve_leftmost_longest():
+    matcher = PhraseMatcher(["the end", "end of the tunnel", "tunnel", "the"])
+    text = "at the end of the tunnel"
+    assert matcher.find(text) == [Match(3, 10, 0), Match(14, 17, 3), Match(18, 24, 2)]
+    # same start: the longer phrase wins regardless of order
+    assert PhraseMatcher(["end", "end of"]).find("end of it") == [Match(0, 6, 1)]
+
+
+def test_whole_words():
+    matcher = PhraseMatcher(["art"], whole_words=True)
+    assert [m.start for m in matcher.find("start art, party-art")] == [6, 17]
+
+
+def test_matches_brute_force_scan():
+    phrases = ["ab", "bab", "b", "abab", "c"]
+    text = "abababcbabcab"
+    expected = {(m.start(), m.start() + len(p), i) for i, p in enumerate(phrases) for m in re.finditer(f"(?={p})", text)}
+    assert set(PhraseMatcher(phrases).find_all(text)) == expected
+
+
+def test_empty_phrase_rejected():
+    with pytest.raises(ValueError):
+        PhraseMatcher(["ok", ""])
+
+
+def test_multi_markup_per_phrase_attrs_and_escaping():
+    markup = make_multi_markup(
+        "R&D beats R&D <fast>",
+        {"R&D": {"weight": "bold"}, "fast": None},
+        highlight_color=(1.0, 0.0, 0.0),
+    )
+    assert markup.count("<span foreground='#ff0000' weight='bold'>R&amp;D</span>") == 2
+    assert "&lt;<span foreground='#ff0000'>fast</span>&gt;" in markup
+
+
+def test_multi_markup_single_phrase_matches_make_markup():
+    sentence, phrase = "Growth comes from stepping out of the comfort zone.", "comfort zone"
+    attrs = {"underline": "single"}
+    assert make_multi_markup(sentence, {phrase: attrs}) == make_markup(sentence, phrase, extra_attrs=attrs)
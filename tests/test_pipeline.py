@@ -1,5 +1,26 @@
 from pathlib import Path
-from video_pipeline import build_ffmpeg_command
+
+import pytest
+
+import video_pipeline as vp
+from video_pipeline import (
+    build_ffmpeg_command,
+    build_rawvideo_command,
+    build_segment_commands,
+    fingerprint,
+    fingerprint_path,
+    is_up_to_date,
+    load_placement,
+    plan_threads,
+)
+
+
+@pytest.fixture(autouse=True)
+def _no_encoder_probe(monkeypatch):
+    """Build commands as if ffmpeg were absent, whatever the host has installed."""
+    for cached in (vp.probe_encoders, vp.encoder_works, vp._warn_once):
+        cached.cache_clear()
+    monkeypatch.setattr(vp, "probe_encoders", lambda: None)
 
 
 def test_hw_accel_codec(tmp_path):
@@ -36,3 +57,293 @@ def test_sw_codec(tmp_path):
     }
     cmd = build_ffmpeg_command(cfg)
     assert "libx265" in cmd
+
+
+def test_cropped_png_is_overlaid_on_canvas(tmp_path):
+    crop_png = tmp_path / "crop.png"
+    crop_png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    (tmp_path / "crop.json").write_text(
+        '{"x": 120, "y": 480, "width": 800, "height": 90,'
+        ' "canvas_width": 1920, "canvas_height": 1080,'
+        ' "background_rgba": [0.0, 0.0, 0.0, 0.0]}'
+    )
+    cfg = {
+        "png_path": str(crop_png),
+        "output_video": str(tmp_path / "out.webm"),
+        "width": 1920,
+        "height": 1080,
+        "fps": 30,
+    }
+    cmd = build_ffmpeg_command(cfg)
+    assert "color=c=0x000000@0.0:s=1920x1080:r=30" in cmd
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "overlay=120:480" in graph
+    assert "-vf" not in cmd
+
+
+def test_rawvideo_command_reads_stdin(tmp_path):
+    cfg = {
+        "output_video": str(tmp_path / "out.webm"),
+        "width": 1920,
+        "height": 1080,
+        "fps": 25,
+        "codec": "vp9alpha",
+    }
+    cmd = build_rawvideo_command(cfg, 1920, 1080, "bgra")
+    assert cmd[cmd.index("-i") + 1] == "-"
+    assert cmd[cmd.index("-f") + 1] == "rawvideo"
+    assert cmd[cmd.index("-s") + 1] == "1920x1080"
+    assert cmd[cmd.index("-vf") + 1].startswith("unpremultiply=inplace=1,loop=loop=-1:size=1,")
+    assert "libvpx-vp9" in cmd
+
+
+def test_raw_image_uses_rawvideo_demuxer(tmp_path):
+    frame = tmp_path / "demo_color.raw"
+    frame.write_bytes(bytes(4 * 64 * 32))
+    (tmp_path / "demo_color.json").write_text(
+        '{"format": "rawvideo", "pix_fmt": "bgra", "width": 64, "height": 32, "premultiplied": true}'
+    )
+    cfg = {
+        "png_path": str(frame),
+        "output_video": str(tmp_path / "out.webm"),
+        "width": 64,
+        "height": 32,
+        "fps": 30,
+        "codec": "vp9alpha",
+    }
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd[cmd.index("-i") + 1] == str(frame)
+    assert cmd[cmd.index("-f") + 1] == "rawvideo"
+    assert cmd[cmd.index("-s") + 1] == "64x32"
+    assert "-loop" not in cmd
+    # already at video size: no rescale
+    assert cmd[cmd.index("-vf") + 1].startswith("unpremultiply=inplace=1,loop=loop=-1:size=1,fade=")
+
+
+def test_cropped_raw_image_is_unpremultiplied_before_overlay(tmp_path):
+    frame = tmp_path / "crop.raw"
+    frame.write_bytes(bytes(4 * 800 * 90))
+    (tmp_path / "crop.json").write_text(
+        '{"x": 120, "y": 480, "width": 800, "height": 90,'
+        ' "canvas_width": 1920, "canvas_height": 1080,'
+        ' "format": "rawvideo", "pix_fmt": "bgra"}'
+    )
+    cfg = {"png_path": str(frame), "output_video": str(tmp_path / "out.webm"), "width": 1920, "height": 1080}
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd[cmd.index("-s") + 1] == "800x90"
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.startswith("[1:v]unpremultiply=inplace=1,loop=loop=-1:size=1[fg];")
+    assert "[bg][fg]overlay=120:480" in graph
+
+
+def _write_atlas(tmp_path):
+    atlas = tmp_path / "demo_atlas.png"
+    atlas.write_bytes(b"\x89PNG\r\n\x1a\n")
+    (tmp_path / "demo_atlas.json").write_text(
+        '{"canvas_width": 1920, "canvas_height": 1080, "background_rgba": [0, 0, 0, 0],'
+        ' "variants": {"color": {"x": 0, "y": 0, "width": 800, "height": 90, "canvas_x": 560, "canvas_y": 495},'
+        ' "weight": {"x": 802, "y": 0, "width": 820, "height": 90, "canvas_x": 550, "canvas_y": 495}}}'
+    )
+    return atlas
+
+
+def test_atlas_variant_is_cropped_and_overlaid(tmp_path):
+    cfg = {
+        "png_path": str(_write_atlas(tmp_path)),
+        "output_video": str(tmp_path / "out.webm"),
+        "width": 1920,
+        "height": 1080,
+        "atlas_variant": "weight",
+    }
+    cmd = build_ffmpeg_command(cfg)
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.startswith("[1:v]crop=820:90:802:0[fg];")
+    assert "[bg][fg]overlay=550:495" in graph
+
+
+def test_atlas_without_variant_is_rejected(tmp_path):
+    cfg = {"png_path": str(_write_atlas(tmp_path)), "output_video": str(tmp_path / "out.webm")}
+    with pytest.raises(ValueError, match="color, weight"):
+        build_ffmpeg_command(cfg)
+
+
+def test_segmented_encode_repeats_hold_unit(tmp_path):
+    dummy_png = tmp_path / "dummy.png"
+    dummy_png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    cfg = {
+        "png_path": str(dummy_png),
+        "output_video": str(tmp_path / "out.webm"),
+        "width": 640,
+        "height": 360,
+        "fps": 30,
+        "total_duration": 10,
+        "fade_in_duration": 1,
+        "fade_out_duration": 1.5,
+        "codec": "vp9alpha",
+    }
+    commands, concat_list, concat_cmd = build_segment_commands(cfg, tmp_path)
+    # fade-in, one hold unit and fade-out are the only encodes
+    assert len(commands) == 3
+    assert [c[c.index("-t") + 1] for c in commands] == ["1", "1.0", "1.5"]
+    lines = concat_list.splitlines()
+    assert lines.count("file 'hold.webm'") == 8
+    assert lines[-2:] == ["outpoint 0.500000", "file 'fade_out.webm'"]
+    assert concat_cmd[concat_cmd.index("-c") + 1] == "copy"
+
+
+def test_segmented_rejected_with_frames_backend(tmp_path):
+    cfg = _vp9_cfg(tmp_path, backend="frames", encode_mode="segmented")
+    with pytest.raises(ValueError, match="segmented"):
+        vp.encode_png(cfg)
+
+
+def test_fingerprint_tracks_inputs_and_command(tmp_path):
+    out = tmp_path / "out.webm"
+    cmd = ["ffmpeg", "-i", "in.png", str(out)]
+    fp = fingerprint([cmd], [b"png-v1"])
+    assert fp == fingerprint([cmd], [b"png-v1"])
+    assert fp != fingerprint([cmd], [b"png-v2"])
+    assert fp != fingerprint([cmd + ["-r", "60"]], [b"png-v1"])
+
+    assert not is_up_to_date(out, fp)
+    out.write_bytes(b"webm")
+    fingerprint_path(out).write_text(fp + "\n")
+    assert is_up_to_date(out, fp)
+    assert not is_up_to_date(out, fingerprint([cmd], [b"png-v2"]))
+
+
+def test_plan_threads_fills_all_cores():
+    assert plan_threads(500, 32) == (8, 4)
+    assert plan_threads(2, 32) == (2, 16)
+    assert plan_threads(500, 32, workers=16) == (16, 2)
+    assert plan_threads(1, 1) == (1, 1)
+
+
+def test_thread_budget_adds_row_mt_for_vp9(tmp_path):
+    dummy_png = tmp_path / "dummy.png"
+    dummy_png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    cfg = {
+        "png_path": str(dummy_png),
+        "output_video": str(tmp_path / "out.webm"),
+        "codec": "vp9alpha",
+        "threads": 4,
+    }
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd[cmd.index("-threads") + 1] == "4"
+    assert cmd[cmd.index("-row-mt") + 1] == "1"
+
+
+def _vp9_cfg(tmp_path, **extra):
+    dummy_png = tmp_path / "dummy.png"
+    dummy_png.write_bytes(b"\x89PNG\r\n\x1a\n")
+    return {
+        "png_path": str(dummy_png),
+        "output_video": str(tmp_path / "out.webm"),
+        "codec": "vp9alpha",
+        **extra,
+    }
+
+
+def test_preset_maps_to_vp9_speed_args(tmp_path):
+    cmd = build_ffmpeg_command(_vp9_cfg(tmp_path, preset="draft", threads=4))
+    assert cmd[cmd.index("-deadline") + 1] == "realtime"
+    assert cmd[cmd.index("-cpu-used") + 1] == "8"
+    assert cmd.count("-row-mt") == 1
+
+
+def test_unknown_preset_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        build_ffmpeg_command(_vp9_cfg(tmp_path, preset="ludicrous"))
+
+
+def test_missing_encoder_falls_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(vp, "probe_encoders", lambda: {"libvpx": ("yuv420p", "yuva420p")})
+    monkeypatch.setattr(vp, "encoder_works", lambda name, pix_fmt: True)
+    cmd = build_ffmpeg_command(_vp9_cfg(tmp_path, preset="balanced"))
+    assert cmd[cmd.index("-c:v") + 1] == "libvpx"
+    assert cmd[cmd.index("-auto-alt-ref") + 1] == "0"
+
+
+def test_unusable_hw_encoder_falls_back(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(vp, "probe_encoders", lambda: {"hevc_videotoolbox": ("bgra",), "libx265": ("yuva420p",)})
+    monkeypatch.setattr(vp, "encoder_works", lambda name, pix_fmt: name != "hevc_videotoolbox")
+    assert vp.resolve_encoder("hevc_videotoolbox") == ("libx265", "yuva420p")
+    assert "hevc_videotoolbox unavailable in this ffmpeg, using libx265" in capsys.readouterr().err
+    cmd = build_ffmpeg_command(_vp9_cfg(tmp_path, output_video=str(tmp_path / "a.mp4"), codec="hevc_videotoolbox"))
+    assert cmd[cmd.index("-c:v") + 1] == "libx265"
+    assert cmd[cmd.index("-pix_fmt") + 1] == "yuva420p"
+
+
+def test_renditions_share_one_fade(tmp_path):
+    cfg = _vp9_cfg(
+        tmp_path,
+        width=1920,
+        height=1080,
+        renditions=[
+            {"output_video": str(tmp_path / "{stem}_1080.webm")},
+            {"output_video": str(tmp_path / "{stem}_720.mov"), "width": 1280, "height": 720, "codec": "prores_ks"},
+        ],
+    )
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd.count("-i") == 1
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert graph.count("fade=t=in") == 1
+    assert "split=2[r0][r1]" in graph and "[r1]scale=1280:720[v1]" in graph
+    assert cmd[cmd.index("[v1]") + 1] == "-t"
+    assert cmd[-1] == str(tmp_path / "out_720.mov")
+    assert cmd[cmd.index("-c:v", cmd.index("[v1]")) + 1] == "prores_ks"
+
+
+def test_renditions_skip_only_when_all_up_to_date(tmp_path):
+    cfg = _vp9_cfg(tmp_path, renditions=[
+        {"output_video": str(tmp_path / "{stem}_a.webm")},
+        {"output_video": str(tmp_path / "{stem}_b.webm")},
+    ])
+    vp.record_fingerprint(cfg, "fp")
+    (tmp_path / "out_a.webm").write_bytes(b"a")
+    assert not vp.skip_if_unchanged(cfg, "fp", force=False)
+    assert not (tmp_path / "out_a.webm.fingerprint").exists()
+    (tmp_path / "out_b.webm").write_bytes(b"b")
+    vp.record_fingerprint(cfg, "fp")
+    assert vp.skip_if_unchanged(cfg, "fp", force=False)
+
+
+def _png_header(width, height):
+    import struct
+
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+
+
+def test_scale_only_when_png_size_differs(tmp_path):
+    png = tmp_path / "frame.png"
+    cfg = {"png_path": str(png), "output_video": str(tmp_path / "out.webm"), "width": 1280, "height": 720}
+    png.write_bytes(_png_header(1280, 720))
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd[cmd.index("-vf") + 1].startswith("fade=")
+    png.write_bytes(_png_header(1920, 1080))
+    cmd = build_ffmpeg_command(cfg)
+    assert cmd[cmd.index("-vf") + 1].startswith("scale=1280:720,fade=")
+
+
+def test_stale_crop_sidecar_is_ignored(tmp_path):
+    png = tmp_path / "frame.png"
+    png.write_bytes(_png_header(1920, 1080))  # full-canvas render over an old crop's sidecar
+    (tmp_path / "frame.json").write_text(
+        '{"x": 120, "y": 480, "width": 800, "height": 90, "canvas_width": 1920, "canvas_height": 1080}'
+    )
+    assert load_placement(png) is None
+    png.write_bytes(_png_header(800, 90))
+    assert load_placement(png)["x"] == 120
+
+
+def test_ladder_maps_source_sized_rendition_unscaled(tmp_path):
+    png = tmp_path / "frame.png"
+    png.write_bytes(_png_header(1920, 1080))
+    cfg = _vp9_cfg(tmp_path, png_path=str(png), width=1920, height=1080, renditions=[
+        {"output_video": str(tmp_path / "{stem}_1080.webm")},
+        {"output_video": str(tmp_path / "{stem}_720.webm"), "width": 1280, "height": 720},
+    ])
+    cmd = build_ffmpeg_command(cfg)
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "[r0]scale" not in graph and "[r1]scale=1280:720[v1]" in graph
+    assert cmd[cmd.index("-map") + 1] == "[r0]"
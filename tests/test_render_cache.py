@@ -0,0 +1,144 @@
+import json
+import os
+
+from render_cache import RenderCache, cache_key
+
+
+def test_cache_key_is_order_independent():
+    assert cache_key(markup="<b>x</b>", canvas=(1920, 1080)) == cache_key(canvas=(1920, 1080), markup="<b>x</b>")
+    assert cache_key(markup="a") != cache_key(markup="b")
+
+
+def test_store_then_fetch(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=1 << 20)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"png-bytes")
+    (tmp_path / "src.json").write_text('{"x": 1}')
+    key = cache_key(markup="m")
+
+    dest = tmp_path / "out" / "demo_color.png"
+    dest.parent.mkdir()
+    assert not cache.fetch(key, dest)
+    cache.store(key, [src, tmp_path / "src.json"])
+    assert cache.fetch(key, dest)
+    assert dest.read_bytes() == b"png-bytes"
+    assert dest.with_suffix(".json").read_text() == '{"x": 1}'
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0}
+
+
+def test_store_scans_only_when_over_budget(tmp_path, monkeypatch):
+    cache = RenderCache(tmp_path / "cache", max_bytes=100)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"x" * 10)
+    scans = []
+    entries = cache._entries
+    monkeypatch.setattr(cache, "_entries", lambda: scans.append(1) or entries())
+    for i in range(10):
+        cache.store(cache_key(n=i), [src])
+    assert len(scans) == 1 and cache.evictions == 0  # only the initial scan
+    cache.store(cache_key(n=10), [src])
+    assert len(scans) == 2 and cache.evictions == 1
+
+
+def test_concurrent_stores_keep_an_exact_size_total(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    cache = RenderCache(tmp_path / "cache", max_bytes=1 << 30)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"x" * 10)
+    cache.store(cache_key(n=-1), [src])  # initial scan
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: cache.store(cache_key(n=i), [src]), range(200)))
+    assert cache._size == sum(p.stat().st_size for p in (tmp_path / "cache").glob("??/*"))
+
+
+def test_fetch_removes_extras_the_entry_lacks(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=1 << 20)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"png-bytes")
+    key = cache_key(markup="m")
+    cache.store(key, [src])
+    dest = tmp_path / "demo_color.png"
+    dest.with_suffix(".json").write_text('{"x": 1}')  # left by an earlier cropped render
+    assert cache.fetch(key, dest)
+    assert not dest.with_suffix(".json").exists()
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = RenderCache(tmp_path / "cache", max_bytes=25)
+    src = tmp_path / "src.png"
+    src.write_bytes(b"x" * 10)
+    keys = [cache_key(n=i) for i in range(3)]
+    for age, key in enumerate(keys[:2]):
+        cache.store(key, [src])
+        stamp = 1_000_000 + age
+        os.utime(cache._path(key, ".png"), (stamp, stamp))
+    cache.store(keys[2], [src])
+
+    assert cache.evictions == 1
+    assert not cache._path(keys[0], ".png").exists()
+    assert cache._path(keys[1], ".png").exists()
+    assert cache._path(keys[2], ".png").exists()
+
+
+class _FakeSurface:
+    """Duck-typed 1x1 ARGB32 surface, enough for `write_image`."""
+
+    def get_data(self):
+        return b"\0\0\0\xff"
+
+    def get_width(self):
+        return 1
+
+    def get_height(self):
+        return 1
+
+    def get_stride(self):
+        return 4
+
+    def write_to_png(self, path):
+        with open(path, "wb") as f:
+            f.write(b"png")
+
+
+class _FakeSession:
+    surface_bytes = 4
+    surface = _FakeSurface()
+
+    def draw(self, markup, *, wrap_width, background):
+        pass
+
+    def draw_cropped(self, markup, *, wrap_width, background, padding):
+        return _FakeSurface(), {"x": len(markup), "y": 0, "width": 1, "height": 1}
+
+
+def test_miss_after_hit_leaves_cached_sidecar_intact(tmp_path, monkeypatch):
+    import pango_feature_demos as pfd
+    from highlight_core import Settings
+
+    monkeypatch.setattr(pfd, "get_session", lambda *args: _FakeSession())
+    cache = RenderCache(tmp_path / "cache", max_bytes=1 << 20)
+    settings = Settings(crop_output=True, output_format="raw", render_cache=cache)
+    output = tmp_path / "demo_color.raw"
+
+    pfd.render("a", output, quiet=True, settings=settings)
+    pfd.render("bb", output, quiet=True, settings=settings)
+    pfd.render("a", output, quiet=True, settings=settings)  # hit: hardlinks entry "a"
+    pfd.render("ccc", output, quiet=True, settings=settings)  # miss on the same path
+    assert cache.stats()["hits"] == 1
+    assert json.loads(output.with_suffix(".json").read_text())["x"] == 3
+
+    entry = cache._path(pfd.render_cache_key("a", settings), ".json")
+    assert json.loads(entry.read_text())["x"] == 1
+
+
+def test_full_canvas_render_removes_stale_sidecar(tmp_path, monkeypatch):
+    import pango_feature_demos as pfd
+    from highlight_core import Settings
+
+    monkeypatch.setattr(pfd, "get_session", lambda *args: _FakeSession())
+    output = tmp_path / "demo_color.png"
+    pfd.render("a", output, quiet=True, settings=Settings(crop_output=True))
+    assert output.with_suffix(".json").exists()
+    pfd.render("a", output, quiet=True, settings=Settings())
+    assert not output.with_suffix(".json").exists()
@@ -0,0 +1,114 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+import render_daemon
+from highlight_core import Settings, build_variants
+from render_daemon import Metrics, RenderDaemon, build_job, make_server
+
+SETTINGS = Settings()
+VARIANTS = {v[0]: v for v in build_variants(settings=SETTINGS)}
+PAYLOAD = {"sentence": "Growth comes from the comfort zone.", "highlight": "comfort zone"}
+
+
+def test_build_job_uses_variant_and_format(tmp_path):
+    job = build_job({**PAYLOAD, "variant": "weight", "format": "raw", "output": "a/b.png"}, VARIANTS, SETTINGS, tmp_path)
+    assert "weight='bold'" in job.markup
+    assert job.settings.output_format == "raw"
+    assert job.output == (tmp_path / "a" / "b.raw").resolve()
+    assert job.dirty == [(22, 34)]
+
+
+def test_build_job_with_attrs(tmp_path):
+    job = build_job({**PAYLOAD, "attrs": {"weight": "bold", "font_family": "A'><b>"}}, VARIANTS, SETTINGS, tmp_path)
+    assert "weight='bold'" in job.markup
+    assert "font_family='A&#x27;&gt;&lt;b&gt;'" in job.markup
+    multi = build_job({**PAYLOAD, "highlight": ["Growth", "zone"], "attrs": {"style": "italic"}}, VARIANTS, SETTINGS, tmp_path)
+    assert multi.markup.count("style='italic'") == 2
+
+
+@pytest.mark.parametrize("payload", [
+    {"sentence": "x"},
+    {**PAYLOAD, "highlight": ["ok", ""]},
+    {**PAYLOAD, "variant": "sparkle"},
+    {**PAYLOAD, "color": [1, 0]},
+    {**PAYLOAD, "attrs": "weight='bold'"},
+    {**PAYLOAD, "attrs": {"weight": 700}},
+    {**PAYLOAD, "attrs": {"weight='bold' x": "1"}},
+    {**PAYLOAD, "format": "tiff"},
+    {**PAYLOAD, "output": "../escape.png"},
+])
+def test_build_job_rejects_bad_requests(tmp_path, payload):
+    with pytest.raises(ValueError):
+        build_job(payload, VARIANTS, SETTINGS, tmp_path)
+
+
+def test_metrics_percentiles():
+    metrics = Metrics()
+    for ms in range(1, 101):
+        metrics.observe(ms / 1e3)
+    snap = metrics.snapshot()
+    assert snap["rendered"] == 100
+    assert snap["latency_ms"]["p50"] == 51.0 and snap["latency_ms"]["max"] == 100.0
+
+
+@pytest.fixture
+def daemon(tmp_path, monkeypatch):
+    release = threading.Event()
+
+    def fake_run_job(job):
+        release.wait(5)
+        return b"image", {"x": 1}
+
+    monkeypatch.setattr(render_daemon, "run_job", fake_run_job)
+    app = RenderDaemon(SETTINGS, list(VARIANTS.values()), tmp_path, workers=1, queue=0, timeout=5, quiet=True)
+    server = make_server(app, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1], release
+    release.set()
+    server.shutdown()
+    server.server_close()
+    app.close()
+
+
+def _request(port, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.request(method, path, body=json.dumps(body) if body is not None else None)
+    resp = conn.getresponse()
+    return resp.status, dict(resp.getheaders()), resp.read()
+
+
+def test_daemon_serves_health_render_and_rejects_when_full(daemon):
+    port, release = daemon
+    assert _request(port, "GET", "/health")[0] == 200
+    assert _request(port, "POST", "/render", {"sentence": "x"})[0] == 400
+
+    results = []
+    first = threading.Thread(target=lambda: results.append(_request(port, "POST", "/render", PAYLOAD)))
+    first.start()
+    while json.loads(_request(port, "GET", "/metrics")[2])["in_flight"] == 0:
+        pass
+    status, headers, _ = _request(port, "POST", "/render", PAYLOAD)
+    assert status == 503 and headers["Retry-After"] == "1"
+    release.set()
+    first.join()
+    status, headers, body = results[0]
+    assert (status, body) == (200, b"image")
+    assert json.loads(headers["X-Image-Meta"]) == {"x": 1}
+
+    metrics = json.loads(_request(port, "GET", "/metrics")[2])
+    assert (metrics["rendered"], metrics["rejected"], metrics["bad_request"]) == (1, 1, 1)
+
+
+@pytest.mark.parametrize("length", ["abc", "-5"])
+def test_daemon_rejects_bad_content_length(daemon, length):
+    port, _ = daemon
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    conn.putrequest("POST", "/render")
+    conn.putheader("Content-Length", length)
+    conn.endheaders()
+    resp = conn.getresponse()
+    assert resp.status == 400 and b"Content-Length" in resp.read()
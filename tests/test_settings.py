@@ -0,0 +1,56 @@
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from highlight_core import Settings, build_variants, load_config, make_markup
+
+
+def test_from_config_resolves_colours_and_inherits_base():
+    base = Settings(canvas_width=1280, base_font_family="Inter")
+    s = Settings.from_config({"canvas_height": 720, "text_color_hsla": [0.0, 0.0, 0.0, 1.0]}, base)
+    assert (s.canvas_width, s.canvas_height, s.base_font_family) == (1280, 720, "Inter")
+    assert s.text_color == (0.0, 0.0, 0.0)
+    assert s.wrap_width == int(1280 * 0.85)
+
+
+def test_settings_are_frozen_and_slotted():
+    s = Settings()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        s.canvas_width = 10  # type: ignore[misc]
+    assert not hasattr(s, "__dict__")
+
+
+def test_invalid_settings_rejected():
+    with pytest.raises(ValueError):
+        Settings.from_config({"output_format": "tiff"})
+    with pytest.raises(ValueError):
+        Settings(paginate=True, atlas_output=True)
+    with pytest.raises(ValueError):
+        Settings.from_config({"memory_budget_mb": 0})
+
+
+def test_differently_configured_jobs_render_side_by_side():
+    arial = Settings()
+    mono = Settings.from_config({"base_font_family": "DejaVu Sans Mono", "base_font_size_pt": 20})
+
+    def job(settings):
+        return [make_markup("a b c", "b", extra_attrs=attrs, highlight_color=color, settings=settings)
+                for _, attrs, color in build_variants(settings=settings)]
+
+    with ThreadPoolExecutor(4) as pool:
+        results = list(pool.map(job, [arial, mono] * 8))
+    assert all("font_family='Arial' size='51200'" in m for m in results[0])
+    assert all("font_family='DejaVu Sans Mono' size='20480'" in m for m in results[1])
+    assert results[::2] == [results[0]] * 8 and results[1::2] == [results[1]] * 8
+
+
+def test_video_config_drives_canvas(tmp_path):
+    (tmp_path / "video.yml").write_text(
+        "width: 1280\nheight: 720\nrenditions:\n"
+        "  - {output_video: a.webm}\n  - {output_video: b.webm, width: 3840, height: 2160}\n"
+    )
+    (tmp_path / "config.yml").write_text("video_config: video.yml\ncanvas_width: 640\ncanvas_height: 360\n")
+    s = Settings.from_config(load_config(tmp_path / "config.yml"))
+    assert (s.canvas_width, s.canvas_height) == (3840, 2160)
+    assert s.wrap_width == int(3840 * 0.85)
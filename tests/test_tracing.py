@@ -0,0 +1,30 @@
+import json
+
+import tracing
+from tracing import Tracer
+
+
+def test_span_is_noop_when_disabled():
+    assert not tracing.TRACER.enabled
+    with tracing.span("config.load"):
+        pass
+    assert tracing.TRACER.events == []
+
+
+def test_export_chrome_trace_with_summary(tmp_path):
+    tracer = Tracer()
+    for _ in range(2):
+        with tracer.span("png.write", output="a.png"):
+            pass
+    with tracer.span("ffmpeg.run"):
+        pass
+
+    out = tmp_path / "trace.json"
+    tracer.export(out)
+    payload = json.loads(out.read_text())
+    events = payload["traceEvents"]
+    assert [e["name"] for e in events] == ["png.write", "png.write", "ffmpeg.run"]
+    assert all(e["ph"] == "X" and e["dur"] >= 0 for e in events)
+    assert events[0]["args"]["output"] == "a.png"
+    assert payload["summary"]["png.write"]["count"] == 2
+    assert payload["summary"]["ffmpeg.run"]["count"] == 1
@@ -0,0 +1,124 @@
+"""Opt-in per-stage tracing for the render and video CLIs.
+
+Stages are wrapped in `span("name")` blocks.  While tracing is disabled (the
+default) a span is a shared no-op context manager.  Once `enable()` has been
+called, every span records its wall time and the process memory high-water
+mark (peak RSS, plus the peak of finished child processes such as ffmpeg).
+`export()` writes the events in Chrome trace event format, which
+chrome://tracing and Perfetto can open, together with an aggregate per-stage
+summary.
+
+Events from worker processes can be collected with `drain()` and merged into
+the parent's tracer with `extend()`, so batch runs produce a single trace.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+try:
+    import resource
+except ImportError:  # pragma: no cover – Windows
+    resource = None  # type: ignore[assignment]
+
+# ru_maxrss is KiB on Linux but bytes on macOS
+_RSS_SCALE = 1 if sys.platform == "darwin" else 1024
+
+
+def _peak_rss() -> Dict[str, int]:
+    if resource is None:
+        return {}
+    return {
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_SCALE,
+        "peak_child_rss_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * _RSS_SCALE,
+    }
+
+
+class Tracer:
+    """Collects Chrome "complete" (``ph: X``) events."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.events: List[dict] = []
+
+    @contextmanager
+    def span(self, name: str, **args: object) -> Iterator[None]:
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            self.events.append({
+                "name": name,
+                "cat": name.split(".", 1)[0],
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {**args, **_peak_rss()},
+            })
+
+    def drain(self) -> List[dict]:
+        """Remove and return the events recorded so far."""
+        events, self.events = self.events, []
+        return events
+
+    def extend(self, events: List[dict]) -> None:
+        self.events.extend(events)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Aggregate count / total / mean / max wall time (ms) and peak RSS per stage."""
+        stages: Dict[str, Dict[str, float]] = {}
+        for ev in self.events:
+            st = stages.setdefault(ev["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0, "peak_rss_mb": 0.0})
+            dur_ms = ev["dur"] / 1000
+            st["count"] += 1
+            st["total_ms"] += dur_ms
+            st["max_ms"] = max(st["max_ms"], dur_ms)
+            st["peak_rss_mb"] = max(st["peak_rss_mb"], ev["args"].get("peak_rss_bytes", 0) / 2**20)
+        for st in stages.values():
+            st["mean_ms"] = st["total_ms"] / st["count"]
+        return stages
+
+    def export(self, path: str | Path) -> None:
+        """Write a Chrome trace JSON (with the summary under ``"summary"``)."""
+        payload = {"traceEvents": self.events, "displayTimeUnit": "ms", "summary": self.summary()}
+        Path(path).write_text(json.dumps(payload, indent=1), encoding="utf-8")
+
+    def print_summary(self) -> None:
+        print(f"\n{'stage':<24} {'count':>6} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'peak RSS MB':>12}")
+        for name, st in sorted(self.summary().items(), key=lambda kv: -kv[1]["total_ms"]):
+            print(
+                f"{name:<24} {int(st['count']):>6} {st['total_ms']:>10.1f} {st['mean_ms']:>9.2f} "
+                f"{st['max_ms']:>9.2f} {st['peak_rss_mb']:>12.1f}"
+            )
+
+
+TRACER = Tracer()
+_NOOP = nullcontext()
+
+
+def enable() -> None:
+    TRACER.enabled = True
+
+
+def span(name: str, **args: object):
+    """Context manager timing *name*; free when tracing is disabled."""
+    if not TRACER.enabled:
+        return _NOOP
+    return TRACER.span(name, **args)
+
+
+def finish(path: str | Path | None) -> None:
+    """Export the trace to *path* and print the stage summary (if tracing)."""
+    if path and TRACER.enabled:
+        TRACER.export(path)
+        TRACER.print_summary()
+        print(f"Trace written to {path}")
@@ -9,110 +9,908 @@ FFmpeg is invoked through subprocess; make sure FFmpeg is installed.
 
 Note: Some FFmpeg builds lack the `curve` option on the `fade` filter. We
 therefore omit it for broad compatibility (fade will default to linear).
+Set `backend: frames` to have `fade_frames.py` generate the fade in Python
+with the configured easing curves instead.
 """
 from __future__ import annotations
 
+import argparse
+import functools
+import hashlib
+import json
+import os
 import subprocess
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Tuple
 
 import yaml
 
+import image_io
+import tracing
+from image_io import RAW_PIX_FMT
+from tracing import span
+
 ROOT = Path(__file__).resolve().parent
 
 CONFIG_PATH = ROOT / "config_video.yml"
 
-EASING_MAP: Dict[str, str] = {
-    "linear": "linear",
-    "easein": "quadratic",   # approximate mapping
-    "easeout": "quadratic",
-    "easeinout": "cubic",
-}
 
 def run_cmd(cmd: list[str]) -> None:
     """Run a shell command and stream output."""
     print(" \\n> " + " ".join(cmd))
-    proc = subprocess.run(cmd, check=True)
+    with span("ffmpeg.run", output=cmd[-1]):
+        proc = subprocess.run(cmd, check=True)
     if proc.returncode != 0:
         sys.exit(proc.returncode)
 
 
-def build_ffmpeg_command(cfg: dict) -> list[str]:
-    """Construct FFmpeg CLI from config values.
+def load_placement(png_path: Path, variant: str | None = None) -> Dict[str, object] | None:
+    """Return the crop sidecar written next to a tight-bounding-box render.
 
-    If `hw_accel` is true in the YAML and running on macOS/Apple Silicon, we
-    switch codec to `hevc_videotoolbox` for hardware-accelerated encoding.
+    `pango_feature_demos.py` with `crop_output: true` stores the crop's offset
+    on the full canvas in `<name>.json`; plain full-canvas PNGs have none.
+
+    For a variant atlas (`atlas_output: true`) the sidecar indexes every
+    variant; *variant* selects one and the returned placement gains an
+    ``atlas_rect`` ``(x, y, width, height)`` to crop out of the atlas.
+
+    A sidecar whose recorded size differs from the image's is left over from
+    an earlier render of the same name and is ignored.
+    """
+    sidecar = png_path.with_suffix(".json")
+    if not sidecar.exists():
+        return None
+    with open(sidecar, "r", encoding="utf-8") as f:
+        placement = json.load(f)
+    if not _sidecar_matches_image(png_path, placement):
+        print(f"⚠️ ignoring {sidecar.name}: it describes a different image than {png_path.name}", file=sys.stderr)
+        return None
+    if "variants" in placement:
+        entries = placement["variants"]
+        if variant not in entries:
+            raise ValueError(f"atlas {png_path.name} needs atlas_variant, one of: {', '.join(entries)}")
+        entry = entries[variant]
+        return {
+            "x": entry["canvas_x"],
+            "y": entry["canvas_y"],
+            "canvas_width": placement["canvas_width"],
+            "canvas_height": placement["canvas_height"],
+            "background_rgba": placement.get("background_rgba", (0.0, 0.0, 0.0, 0.0)),
+            "atlas_rect": (entry["x"], entry["y"], entry["width"], entry["height"]),
+        }
+    if not {"x", "y", "canvas_width", "canvas_height"} <= placement.keys():
+        return None
+    return placement
+
+
+def _sidecar_matches_image(png_path: Path, placement: Dict[str, object]) -> bool:
+    """False when *placement* records a size other than the image's (a stale sidecar)."""
+    if "width" not in placement or "height" not in placement:
+        return True
+    try:
+        size = image_io.image_size(png_path)
+    except OSError:
+        return True  # image not written yet; nothing to compare against
+    return size is None or size == (placement["width"], placement["height"])
+
+
+def _ffmpeg_color(rgba) -> str:
+    """Format a 0-1 RGBA tuple as an FFmpeg colour (`0xRRGGBB@alpha`)."""
+    r, g, b, a = rgba
+    return "0x" + "".join(f"{int(c*255):02x}" for c in (r, g, b)) + f"@{a}"
+
+
+def resolve_png_path(cfg: dict) -> Path:
+    """Locate the source image, falling back to the newest `demo_color` render.
+
+    Besides PNGs this may be a `.raw` frame written with `output_format: raw`.
+    With `atlas_variant` set the fallback is the newest `demo_atlas` instead.
     """
-    """Construct FFmpeg CLI from config values."""
     png_cfg = cfg["png_path"]
     png_path = (ROOT / png_cfg).expanduser()
     if not png_path.exists():
-        # auto-discover latest demo_color.png under output/
-        candidates = sorted((ROOT / "output").rglob("demo_color.png"), key=lambda p: p.stat().st_mtime, reverse=True)
+        # auto-discover latest demo_color / demo_atlas (.png or .raw) under output/
+        name = "demo_atlas" if cfg.get("atlas_variant") else "demo_color"
+        candidates = sorted(
+            (p for p in (ROOT / "output").rglob(f"{name}.*") if p.suffix in (".png", image_io.RAW_SUFFIX)),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True,
+        )
         if not candidates:
             raise FileNotFoundError(f"PNG not found: {png_cfg} and no candidates under output/")
         png_path = candidates[0]
         print(f"⚠️ Using discovered PNG: {png_path.relative_to(ROOT)}")
-    png = str(png_path)
-    out = str((ROOT / cfg["output_video"]).expanduser())
+    return png_path
+
+
+def _scale_filter(cfg: dict, source_size: Tuple[int, int] | None) -> list[str]:
+    """`scale` to the configured video size, unless the source already has it.
+
+    Frames rendered at video resolution (see `video_config` in config.yml)
+    skip the per-frame resample entirely; an unknown *source_size* scales.
+    """
+    width, height = cfg.get("width"), cfg.get("height")
+    if not (width and height) or source_size == (int(width), int(height)):
+        return []
+    return [f"scale={width}:{height}"]
+
 
-    use_hw = bool(cfg.get("hw_accel", False))
+def _fade_filter(cfg: dict, source_size: Tuple[int, int] | None = None, scale: bool = True) -> str:
+    """Scale + fade-in/out filter chain shared by every input mode.
 
-    width = cfg.get("width")
-    height = cfg.get("height")
+    A rendition ladder fades once at full size (``scale=False``) and scales
+    each output after the `split` instead.
+    """
     fps = cfg.get("fps", 30)
     duration = cfg.get("total_duration", 10)
     fade_in = cfg.get("fade_in_duration", 1.5)
     fade_out = cfg.get("fade_out_duration", 1.5)
 
-    easing_in = EASING_MAP.get(cfg.get("easing_in", "linear"), "linear")
-    easing_out = EASING_MAP.get(cfg.get("easing_out", "linear"), "linear")
-
-    # Build filter string
+    # Build filter string (the `fade` filter is linear; easing needs the
+    # `frames` backend)
     # Start fade-out one frame earlier to ensure opacity hits 0 on last frame
     start_out = duration - fade_out - (1.0 / fps)
     vf_parts = [
-        f"scale={width}:{height}",
+        *(_scale_filter(cfg, source_size) if scale else []),
         f"fade=t=in:st=0:d={fade_in}:alpha=1",
         f"fade=t=out:st={start_out}:d={fade_out}:alpha=1",
     ]
-    vf = ",".join(vf_parts)
+    return ",".join(vf_parts)
+
+
+def rendition_configs(cfg: dict) -> List[dict]:
+    """One config per output: each `renditions` entry merged over *cfg*.
+
+    Without renditions this is just ``[cfg]``.  A rendition's `output_video`
+    may use ``{stem}`` for the stem of the top-level `output_video`, so batch
+    jobs and variants keep distinct names.
+    """
+    renditions = cfg.get("renditions") or []
+    if not renditions:
+        return [cfg]
+    base = {k: v for k, v in cfg.items() if k != "renditions"}
+    stem = Path(cfg["output_video"]).stem
+    targets = []
+    for entry in renditions:
+        if "output_video" not in entry:
+            raise ValueError("every rendition needs its own output_video")
+        targets.append({**base, **entry, "output_video": str(entry["output_video"]).format(stem=stem)})
+    outputs = [t["output_video"] for t in targets]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError(f"renditions write the same output twice: {outputs}")
+    return targets
 
+
+def source_fps(cfg: dict) -> int:
+    """Frame rate the shared fade is computed at: the fastest output's."""
+    return max(t.get("fps", 30) for t in rendition_configs(cfg))
+
+
+def _ladder_args(
+    cfg: dict, duration: float | None, source_size: Tuple[int, int] | None, fade: bool = True
+) -> Tuple[str, list[str]]:
+    """Fade-once filter tail and per-output arguments for all renditions.
+
+    The faded stream is `split` into one branch per rendition, each scaled to
+    its own size (renditions at the source size are mapped unscaled);
+    decoding, unpremultiply, overlay and fade run only once.  Every output
+    gets its own ``-t`` because the looped input is endless.
+    """
+    targets = rendition_configs(cfg)
+    labels = [f"[r{i}]" for i in range(len(targets))]
+    fade_chain = _fade_filter({**cfg, "fps": source_fps(cfg)}, scale=False) + "," if fade else ""
+    graph = f"{fade_chain}split={len(targets)}" + "".join(labels)
+    outputs: list[str] = []
+    for i, (label, target) in enumerate(zip(labels, targets)):
+        scale = _scale_filter(target, source_size)
+        if scale:
+            graph += f";{label}{scale[0]}[v{i}]"
+            label = f"[v{i}]"
+        outputs += ["-map", label, *(["-t", str(duration)] if duration else []), *_output_args(target)]
+    return graph, outputs
+
+
+def _select_codec(cfg: dict) -> str:
     codec = cfg.get("codec", "libx265")
     if codec == "vp9alpha":
         codec = "libvpx-vp9"
-    if use_hw and codec == "libx265":
+    if bool(cfg.get("hw_accel", False)) and codec == "libx265":
         codec = "hevc_videotoolbox"
+    return codec
+
+
+# Encoders tried for each requested codec, best first; later entries are the
+# faster fallbacks used when the local ffmpeg lacks (or cannot open) the
+# preferred one – e.g. `hevc_videotoolbox` is listed by Linux builds too.
+ENCODER_FALLBACKS: Dict[str, Tuple[str, ...]] = {
+    "libvpx-vp9": ("libvpx-vp9", "libvpx"),   # VP8 alpha: larger files, much faster
+    "hevc_videotoolbox": ("hevc_videotoolbox", "libx265"),
+    "libx265": ("libx265",),
+    "prores_ks": ("prores_ks",),
+}
+
+# Pixel format that carries alpha for each known encoder
+ALPHA_PIX_FMTS: Dict[str, str] = {
+    "libvpx-vp9": "yuva420p",
+    "libvpx": "yuva420p",
+    "hevc_videotoolbox": "bgra",
+    "libx265": "yuva420p",
+    "prores_ks": "yuva444p10le",
+}
+
+PRESET_NAMES = ("draft", "balanced", "archive")
+
+# `preset` in config_video.yml → speed settings per encoder
+ENCODER_PRESETS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    "libvpx-vp9": {
+        "draft": ("-deadline", "realtime", "-cpu-used", "8", "-row-mt", "1", "-tile-columns", "2"),
+        "balanced": ("-deadline", "good", "-cpu-used", "4", "-row-mt", "1", "-tile-columns", "2"),
+        "archive": ("-deadline", "good", "-cpu-used", "1", "-row-mt", "1", "-tile-columns", "0"),
+    },
+    "libvpx": {
+        "draft": ("-deadline", "realtime", "-cpu-used", "8"),
+        "balanced": ("-deadline", "good", "-cpu-used", "4"),
+        "archive": ("-deadline", "good", "-cpu-used", "0"),
+    },
+    "hevc_videotoolbox": {
+        "draft": ("-realtime", "1", "-alpha_quality", "0.5"),
+        "balanced": ("-alpha_quality", "0.75"),
+        "archive": ("-alpha_quality", "1", "-q:v", "80"),
+    },
+    "libx265": {
+        "draft": ("-preset", "ultrafast"),
+        "balanced": ("-preset", "medium"),
+        "archive": ("-preset", "slow"),
+    },
+    "prores_ks": {
+        "draft": ("-profile:v", "4444", "-qscale:v", "12"),
+        "balanced": ("-profile:v", "4444"),
+        "archive": ("-profile:v", "4444xq"),
+    },
+}
 
+_ALPHA_FMT_PREFIXES = ("yuva", "gbrap", "rgba", "bgra", "argb", "abgr", "ya")
+
+
+@functools.lru_cache(maxsize=None)
+def probe_encoders() -> Dict[str, Tuple[str, ...]] | None:
+    """Known alpha-capable encoders of the local ffmpeg and their pixel formats.
+
+    Probed once per process (`ffmpeg -encoders`, then `-h encoder=<name>` for
+    the encoders in `ALPHA_PIX_FMTS`).  None when ffmpeg is not installed, in
+    which case the configured codec is used unchecked.
+    """
+    try:
+        proc = subprocess.run(["ffmpeg", "-hide_banner", "-encoders"], capture_output=True, text=True, check=False)
+    except OSError:
+        return None
+    # Lines look like " V....D libvpx-vp9           libvpx VP9 (codec vp9)"
+    listed = {
+        fields[1]
+        for fields in (line.split() for line in proc.stdout.splitlines())
+        if len(fields) >= 2 and len(fields[0]) == 6 and fields[0].startswith("V")
+    }
+    caps: Dict[str, Tuple[str, ...]] = {}
+    for name in ALPHA_PIX_FMTS:
+        if name not in listed:
+            continue
+        info = subprocess.run(
+            ["ffmpeg", "-hide_banner", "-h", f"encoder={name}"], capture_output=True, text=True, check=False
+        ).stdout
+        formats: Tuple[str, ...] = ()
+        for line in info.splitlines():
+            key, _, value = line.strip().partition(":")
+            if key == "Supported pixel formats":
+                formats = tuple(value.split())
+        caps[name] = formats
+    return caps
+
+
+@functools.lru_cache(maxsize=None)
+def encoder_works(name: str, pix_fmt: str) -> bool:
+    """Whether ffmpeg can actually open *name* for *pix_fmt* (one tiny frame)."""
     cmd = [
-        # Note: `pix_fmt yuva420p` can fail with libx265; removed for robustness.
-        "ffmpeg",
-        "-y",                   # overwrite output
-        "-loop", "1",
-        "-i", png,
-        "-t", str(duration),
-        "-vf", vf,
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-f", "lavfi", "-i", "color=c=white@0.5:s=64x64:d=0.1,format=rgba",
+        "-frames:v", "1", "-c:v", name, "-pix_fmt", pix_fmt, "-f", "null", "-",
+    ]
+    try:
+        return subprocess.run(cmd, capture_output=True, check=False).returncode == 0
+    except OSError:
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def _warn_once(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+def _alpha_pix_fmt(name: str, formats: Tuple[str, ...]) -> str | None:
+    preferred = ALPHA_PIX_FMTS[name]
+    if not formats or preferred in formats:  # unparsed help output: trust the table
+        return preferred
+    return next((f for f in formats if f.startswith(_ALPHA_FMT_PREFIXES)), None)
+
+
+def resolve_encoder(codec: str) -> Tuple[str, str]:
+    """``(encoder, pix_fmt)`` actually used for the requested *codec*.
+
+    Walks `ENCODER_FALLBACKS` and returns the first encoder the probe found
+    and that opens with an alpha pixel format, so a missing encoder is
+    detected before a batch starts rather than failing each job.
+    """
+    caps = probe_encoders()
+    if caps is None or codec not in ENCODER_FALLBACKS:
+        return codec, ALPHA_PIX_FMTS.get(codec, "yuva420p")
+    for name in ENCODER_FALLBACKS[codec]:
+        if name not in caps:
+            continue
+        pix_fmt = _alpha_pix_fmt(name, caps[name])
+        if pix_fmt and encoder_works(name, pix_fmt):
+            if name != codec:
+                _warn_once(f"⚠️ {codec} unavailable in this ffmpeg, using {name}")
+            return name, pix_fmt
+    _warn_once(f"⚠️ No working alpha encoder for {codec}; ffmpeg may drop transparency")
+    return codec, ALPHA_PIX_FMTS[codec]
+
+
+def _thread_args(codec: str, threads: int | None) -> list[str]:
+    """Per-process encoder thread budget (see `run_jobs`)."""
+    if not threads:
+        return []
+    args = ["-threads", str(threads)]
+    if codec == "libvpx-vp9":
+        # Without row-mt libvpx-vp9 uses barely two cores at 1080p.
+        args += ["-row-mt", "1"]
+    return args
+
+
+def _encoder_args(codec: str, cfg: dict) -> list[str]:
+    """Speed preset plus thread budget for *codec*."""
+    preset = cfg.get("preset")
+    if preset is not None and preset not in PRESET_NAMES:
+        raise ValueError(f"unknown preset {preset!r}, expected one of: {', '.join(PRESET_NAMES)}")
+    args = list(ENCODER_PRESETS.get(codec, {}).get(preset, ())) if preset else []
+    threads = _thread_args(codec, cfg.get("threads"))
+    if "-row-mt" in args and "-row-mt" in threads:
+        del threads[threads.index("-row-mt"):threads.index("-row-mt") + 2]
+    if codec == "libvpx":
+        # libvpx's VP8 alpha plane does not survive alt-ref frames.
+        args += ["-auto-alt-ref", "0"]
+    return args + threads
+
+
+def _output_args(cfg: dict, out: str | None = None) -> list[str]:
+    """Encoder and output arguments shared by every input mode."""
+    if out is None:
+        out = str((ROOT / cfg["output_video"]).expanduser())
+    codec, pix_fmt = resolve_encoder(_select_codec(cfg))
+    loglevel = ["-loglevel", cfg["loglevel"]] if cfg.get("loglevel") else []
+    return [
+        *loglevel,
         "-c:v", codec,
-        "-pix_fmt", "yuva420p",
-       
-        "-r", str(fps),
+        *_encoder_args(codec, cfg),
+        "-pix_fmt", pix_fmt,
+        "-r", str(cfg.get("fps", 30)),
         out,
     ]
+
+
+def build_ffmpeg_command(cfg: dict) -> list[str]:
+    """Construct FFmpeg CLI from config values.
+
+    If `hw_accel` is true in the YAML and running on macOS/Apple Silicon, we
+    switch codec to `hevc_videotoolbox` for hardware-accelerated encoding.
+    """
+    png_path = resolve_png_path(cfg)
+    duration = cfg.get("total_duration", 10)
+    size = source_size(png_path, cfg.get("atlas_variant"))
+    if cfg.get("renditions"):
+        graph, outputs = _ladder_args(cfg, duration, size)
+        return [
+            "ffmpeg",
+            "-y",
+            *_png_source_args(png_path, source_fps(cfg), graph, None, cfg.get("atlas_variant")),
+            *outputs,
+        ]
+    cmd = [
+        "ffmpeg",
+        "-y",                   # overwrite output
+        *_png_source_args(png_path, cfg.get("fps", 30), _fade_filter(cfg, size), duration, cfg.get("atlas_variant")),
+        *_output_args(cfg),
+    ]
     return cmd
 
 
+def source_size(png_path: Path, variant: str | None = None) -> Tuple[int, int] | None:
+    """Size of the frames the fade sees: the overlay canvas of a crop or
+    atlas entry, otherwise the image itself (PNG IHDR or raw sidecar)."""
+    placement = load_placement(png_path, variant)
+    if placement:
+        return int(placement["canvas_width"]), int(placement["canvas_height"])  # type: ignore[arg-type]
+    return image_io.image_size(png_path)
+
+
+def _png_source_args(
+    png_path: Path, fps: int, vf: str, duration: float | None, variant: str | None = None
+) -> list[str]:
+    """Input, duration and filter arguments for a looped still image.
+
+    PNGs are looped by the image demuxer; a `.raw` frame is read with the
+    rawvideo demuxer, unpremultiplied and repeated with the `loop` filter.
+    From an atlas, *variant*'s rectangle is cropped out before the overlay.
+    A *vf* with labelled pads (a rendition ladder, which passes
+    ``duration=None`` and sets ``-t`` per output) always uses
+    `-filter_complex`.
+    """
+    png = str(png_path)
+    placement = load_placement(png_path, variant)
+    raw = image_io.load_raw_meta(png_path)
+    still = []
+    if raw:
+        image_args = [
+            "-f", "rawvideo",
+            "-pix_fmt", str(raw["pix_fmt"]),
+            "-s", f"{raw['width']}x{raw['height']}",
+            "-framerate", str(fps),
+            "-i", png,
+        ]
+        still.append("unpremultiply=inplace=1")
+    else:
+        image_args = ["-loop", "1", "-i", png]
+    if placement and "atlas_rect" in placement:
+        ax, ay, aw, ah = placement["atlas_rect"]  # type: ignore[misc]
+        still.append(f"crop={aw}:{ah}:{ax}:{ay}")
+    if raw:
+        still.append("loop=loop=-1:size=1")
+    if placement:
+        # Cropped render: rebuild the full canvas by overlaying the crop onto a
+        # background-coloured (usually transparent) colour source.
+        bg = _ffmpeg_color(placement.get("background_rgba", (0.0, 0.0, 0.0, 0.0)))
+        canvas = f"{placement['canvas_width']}x{placement['canvas_height']}"
+        input_args = [
+            "-f", "lavfi", "-i", f"color=c={bg}:s={canvas}:r={fps}",
+            *image_args,
+        ]
+        fg = f"[1:v]{','.join(still)}[fg];" if still else ""
+        filter_args = [
+            "-filter_complex",
+            f"{fg}[0:v]format=rgba[bg];[bg][{'fg' if still else '1:v'}]overlay={placement['x']}:{placement['y']},"
+            + vf,
+        ]
+    elif "[" in vf:
+        input_args = image_args
+        filter_args = ["-filter_complex", "[0:v]" + ",".join([*still, vf])]
+    else:
+        input_args = image_args
+        filter_args = ["-vf", ",".join([*still, vf])]
+    duration_args = ["-t", str(duration)] if duration is not None else []
+    return [*input_args, *duration_args, *filter_args]
+
+
+def build_segment_commands(cfg: dict, workdir: Path) -> Tuple[list[list[str]], str, list[str]]:
+    """Plan a segmented encode: fade-in, static hold and fade-out encoded apart.
+
+    Only the fades and one short hold unit (`hold_segment_duration`, default
+    1 s) are actually encoded.  The concat list repeats the hold unit to fill
+    the static middle and the final command joins everything with stream
+    copy, so encode time scales with the fade durations rather than the clip
+    length.
+
+    Returns ``(segment_commands, concat_list_text, concat_command)``; the
+    segment files and list are expected to live in *workdir*.
+    """
+    png_path = resolve_png_path(cfg)
+    fps = cfg.get("fps", 30)
+    duration = cfg.get("total_duration", 10)
+    fade_in = cfg.get("fade_in_duration", 1.5)
+    fade_out = cfg.get("fade_out_duration", 1.5)
+    hold = max(0.0, duration - fade_in - fade_out)
+    hold_unit = min(hold, cfg.get("hold_segment_duration", 1.0))
+    ext = Path(cfg["output_video"]).suffix or ".webm"
+    scale = _scale_filter(cfg, source_size(png_path, cfg.get("atlas_variant")))
+
+    commands: list[list[str]] = []
+    entries: list[str] = []
+
+    def segment(name: str, vf: str, seg_duration: float) -> str:
+        path = workdir / f"{name}{ext}"
+        commands.append([
+            "ffmpeg", "-y",
+            *_png_source_args(png_path, fps, vf, seg_duration, cfg.get("atlas_variant")),
+            *_output_args(cfg, str(path)),
+        ])
+        return path.name
+
+    if fade_in > 0:
+        fade = ",".join([*scale, f"fade=t=in:st=0:d={fade_in}:alpha=1"])
+        entries.append(f"file '{segment('fade_in', fade, fade_in)}'")
+    if hold_unit > 0:
+        hold_name = segment("hold", ",".join(scale) or "null", hold_unit)
+        repeats, remainder = divmod(hold, hold_unit)
+        entries += [f"file '{hold_name}'"] * int(repeats)
+        if remainder >= 1.0 / fps:
+            entries += [f"file '{hold_name}'", f"outpoint {remainder:.6f}"]
+    if fade_out > 0:
+        # End one frame early so the last frame is fully transparent.
+        fade = ",".join([*scale, f"fade=t=out:st=0:d={max(fade_out - 1.0 / fps, 0.0)}:alpha=1"])
+        entries.append(f"file '{segment('fade_out', fade, fade_out)}'")
+
+    list_path = workdir / "segments.txt"
+    concat_cmd = [
+        "ffmpeg", "-y",
+        "-f", "concat", "-safe", "0",
+        "-i", str(list_path),
+        "-c", "copy",
+        str((ROOT / cfg["output_video"]).expanduser()),
+    ]
+    return commands, "\n".join(entries) + "\n", concat_cmd
+
+
+def run_segmented(cfg: dict) -> None:
+    """Encode the clip with :func:`build_segment_commands` in a temp directory."""
+    with tempfile.TemporaryDirectory(prefix="segments_") as tmp:
+        workdir = Path(tmp)
+        commands, concat_list, concat_cmd = build_segment_commands(cfg, workdir)
+        for cmd in commands:
+            run_cmd(cmd)
+        (workdir / "segments.txt").write_text(concat_list, encoding="utf-8")
+        run_cmd(concat_cmd)
+
+
+def build_rawvideo_command(cfg: dict, width: int, height: int, pix_fmt: str = "bgra") -> list[str]:
+    """FFmpeg CLI that reads one premultiplied raw frame from stdin.
+
+    The frame is the Cairo ARGB32 buffer exposed by
+    `pango_feature_demos.render_raster`; `unpremultiply` restores straight
+    alpha and `loop` repeats the single frame for the whole clip, so no PNG is
+    written or decoded.
+    """
+    fps = source_fps(cfg)
+    duration = cfg.get("total_duration", 10)
+    still = "unpremultiply=inplace=1,loop=loop=-1:size=1,"
+    if cfg.get("renditions"):
+        graph, outputs = _ladder_args(cfg, duration, (width, height))
+        filter_args = ["-filter_complex", "[0:v]" + still + graph, *outputs]
+    else:
+        filter_args = ["-t", str(duration), "-vf", still + _fade_filter(cfg, (width, height)), *_output_args(cfg)]
+    return [
+        "ffmpeg",
+        "-y",
+        "-f", "rawvideo",
+        "-pix_fmt", pix_fmt,
+        "-s", f"{width}x{height}",
+        "-framerate", str(fps),
+        "-i", "-",
+        *filter_args,
+    ]
+
+
+def build_frames_command(cfg: dict, width: int, height: int, pix_fmt: str = "bgra") -> list[str]:
+    """FFmpeg CLI that encodes pre-faded raw frames streamed on stdin.
+
+    Used by the `frames` backend: opacity is already baked into every frame by
+    `fade_frames.iter_frames`, so only unpremultiply and scale remain.
+    With renditions the frames are generated at `source_fps`.
+    """
+    if cfg.get("renditions"):
+        graph, outputs = _ladder_args(cfg, None, (width, height), fade=False)
+        filter_args = ["-filter_complex", "[0:v]unpremultiply=inplace=1," + graph, *outputs]
+    else:
+        vf = ",".join(["unpremultiply=inplace=1", *_scale_filter(cfg, (width, height))])
+        filter_args = ["-vf", vf, *_output_args(cfg)]
+    return [
+        "ffmpeg",
+        "-y",
+        "-f", "rawvideo",
+        "-pix_fmt", pix_fmt,
+        "-s", f"{width}x{height}",
+        "-framerate", str(source_fps(cfg)),
+        "-i", "-",
+        *filter_args,
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_version() -> str:
+    """First line of `ffmpeg -version` ("" when ffmpeg is not installed)."""
+    try:
+        proc = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, check=False)
+    except OSError:
+        return ""
+    return proc.stdout.splitlines()[0] if proc.stdout else ""
+
+
+def fingerprint(commands: Iterable[list[str]], inputs: Iterable, extra: object = None) -> str:
+    """Hash of the input image bytes, the ffmpeg commands and ffmpeg's version."""
+    h = hashlib.sha256()
+    with span("fingerprint"):
+        for chunk in inputs:
+            h.update(hashlib.sha256(chunk).digest())
+    h.update(json.dumps({"cmds": list(commands), "ffmpeg": ffmpeg_version(), "extra": extra}, sort_keys=True).encode())
+    return h.hexdigest()
+
+
+def fingerprint_path(output: Path) -> Path:
+    """Fingerprint file stored alongside an encoded video."""
+    return output.with_name(output.name + ".fingerprint")
+
+
+def is_up_to_date(output: Path, fp: str) -> bool:
+    """True when *output* exists and was produced from fingerprint *fp*."""
+    marker = fingerprint_path(output)
+    return output.exists() and marker.exists() and marker.read_text(encoding="utf-8").strip() == fp
+
+
+def _outputs(cfg: dict) -> List[Path]:
+    return [(ROOT / t["output_video"]).expanduser() for t in rendition_configs(cfg)]
+
+
+def skip_if_unchanged(cfg: dict, fp: str, force: bool) -> bool:
+    """True when the encode for *cfg* can be skipped; otherwise clear its markers.
+
+    With renditions all outputs come from one ffmpeg run, so it is skipped
+    only when every one of them is up to date.
+    """
+    outputs = _outputs(cfg)
+    if not force and cfg.get("skip_unchanged", True) and all(is_up_to_date(out, fp) for out in outputs):
+        print(f"⏭️ Unchanged, skipping encode: {', '.join(t['output_video'] for t in rendition_configs(cfg))}")
+        return True
+    # Drop stale markers first so an interrupted encode is never trusted.
+    for out in outputs:
+        fingerprint_path(out).unlink(missing_ok=True)
+    return False
+
+
+def record_fingerprint(cfg: dict, fp: str) -> None:
+    """Mark the outputs of *cfg* as produced from fingerprint *fp*."""
+    for out in _outputs(cfg):
+        fingerprint_path(out).write_text(fp + "\n", encoding="utf-8")
+
+
+class EncodePlan(NamedTuple):
+    """How `encode` turns an in-memory frame into a video."""
+
+    cmd: list[str]
+    fingerprint: str
+    chunks: Iterator  # bytes-like pieces to write to ffmpeg's stdin, in order
+
+
+def plan_encode(cfg: dict, data, width: int, height: int, pix_fmt: str = "bgra") -> EncodePlan:
+    """ffmpeg command, fingerprint and stdin source for the configured backend.
+
+    With ``backend: frames`` the chunks are the eased fade frames (computed
+    lazily, batch by batch); otherwise the single raw frame that ffmpeg loops.
+    """
+    if cfg.get("backend", "ffmpeg") == "frames":
+        import fade_frames
+
+        cmd = build_frames_command(cfg, width, height, pix_fmt)
+        extra = {k: cfg.get(k) for k in ("total_duration", "fade_in_duration", "fade_out_duration", "easing_in", "easing_out")}
+        alphas = fade_frames.alpha_schedule({**cfg, "fps": source_fps(cfg)})
+        chunks = fade_frames.iter_frames(data, alphas, cfg.get("frame_batch", 8))
+    else:
+        cmd = build_rawvideo_command(cfg, width, height, pix_fmt)
+        extra = None
+        chunks = iter([data])
+    return EncodePlan(cmd, fingerprint([cmd], [data], extra), chunks)
+
+
+def encode(cfg: dict, data, width: int, height: int, pix_fmt: str = "bgra", *, force: bool = False) -> None:
+    """Encode an in-memory premultiplied frame with the configured backend."""
+    plan = plan_encode(cfg, data, width, height, pix_fmt)
+    if skip_if_unchanged(cfg, plan.fingerprint, force):
+        return
+    stream_raster(plan.cmd, plan.chunks)
+    record_fingerprint(cfg, plan.fingerprint)
+
+
+def encode_png(cfg: dict, *, force: bool = False) -> None:
+    """Encode the configured PNG, skipping ffmpeg when nothing changed."""
+    png_path = resolve_png_path(cfg)
+    placement = load_placement(png_path, cfg.get("atlas_variant"))
+    segmented = cfg.get("encode_mode", "single") == "segmented"
+    if cfg.get("backend", "ffmpeg") == "frames":
+        if segmented:
+            raise ValueError("encode_mode: segmented needs backend: ffmpeg")
+        import fade_frames
+
+        data, width, height = fade_frames.load_png_raster(png_path, placement)
+        encode(cfg, data, width, height, RAW_PIX_FMT, force=force)
+        return
+
+    inputs = [png_path.read_bytes()]
+    sidecar = png_path.with_suffix(".json")
+    if sidecar.exists():  # crop placement and/or rawvideo description
+        inputs.append(sidecar.read_bytes())
+    if not segmented:
+        cmd = build_ffmpeg_command(cfg)
+        fp = fingerprint([cmd], inputs)
+        if skip_if_unchanged(cfg, fp, force):
+            return
+        run_cmd(cmd)
+        record_fingerprint(cfg, fp)
+        return
+
+    # The concat step stream-copies, so each rendition is segmented on its own.
+    for target in rendition_configs(cfg):
+        # Plan against a fixed placeholder so the temp dir doesn't change the hash.
+        commands, concat_list, concat_cmd = build_segment_commands(target, Path("segments"))
+        fp = fingerprint([*commands, concat_cmd], inputs, concat_list)
+        if skip_if_unchanged(target, fp, force):
+            continue
+        run_segmented(target)
+        record_fingerprint(target, fp)
+
+
+def stream_raster(cmd: list[str], chunks: Iterable) -> None:
+    """Run *cmd* and feed it *chunks* (bytes/memoryviews, see `plan_encode`) on stdin."""
+    print(" \\n> " + " ".join(cmd))
+    with span("ffmpeg.run", output=cmd[-1], stdin="rawvideo"):
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        try:
+            for chunk in chunks:
+                proc.stdin.write(chunk)  # type: ignore[union-attr]
+        finally:
+            proc.stdin.close()  # type: ignore[union-attr]
+        proc.wait()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, cmd)
+
+
+DEFAULT_THREADS_PER_JOB = 4
+
+
+def plan_threads(n_jobs: int, cores: int, workers: int | None = None) -> Tuple[int, int]:
+    """Split *cores* into ``(concurrent ffmpeg processes, threads per process)``.
+
+    By default each encode gets about `DEFAULT_THREADS_PER_JOB` threads (where
+    libvpx-vp9 with row-mt still scales well) and as many encodes run side by
+    side as fit; with fewer jobs than slots the spare cores go to each job.
+    """
+    if workers is None:
+        workers = max(1, cores // DEFAULT_THREADS_PER_JOB)
+    workers = max(1, min(workers, n_jobs))
+    return workers, max(1, cores // workers)
+
+
+def read_batch(path: Path, base_cfg: dict) -> List[dict]:
+    """Expand a batch manifest into one config dict per job.
+
+    Each non-empty line is either a PNG path or a JSON object overriding
+    config keys (at least `png_path`).  Outputs default to
+    `<output_video dir>/<png stem><output_video suffix>`.
+    """
+    out_template = Path(base_cfg["output_video"])
+    jobs = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        overrides = json.loads(line) if line.startswith("{") else {"png_path": line}
+        job = {**base_cfg, **overrides}
+        if "output_video" not in overrides:
+            stem = Path(job["png_path"]).stem
+            job["output_video"] = str(out_template.with_name(stem + (out_template.suffix or ".webm")))
+        jobs.append(job)
+    return jobs
+
+
+def run_jobs(jobs: List[dict], workers: int | None = None, *, force: bool = False) -> List[Dict[str, object]]:
+    """Encode many PNG→video jobs concurrently with a shared thread budget.
+
+    Returns one ``{"output", "seconds", "error"}`` dict per job and prints
+    queue depth and wall time as each job finishes.
+    """
+    cores = os.cpu_count() or 1
+    workers, threads = plan_threads(len(jobs), cores, workers)
+    print(f"Encoding {len(jobs)} jobs: {workers} concurrent × {threads} threads ({cores} cores)")
+    # Probe and pick encoders (with fallbacks) once, before any job starts.
+    for codec in sorted({_select_codec(job) for job in jobs}):
+        print(f"Encoder for {codec}: {resolve_encoder(codec)[0]}")
+
+    lock = threading.Lock()
+    state = {"queued": len(jobs), "running": 0, "done": 0}
+
+    def run_one(job: dict) -> Dict[str, object]:
+        with lock:
+            state["queued"] -= 1
+            state["running"] += 1
+        start = time.perf_counter()
+        error = None
+        try:
+            encode_png({**job, "threads": threads, "loglevel": job.get("loglevel", "error")}, force=force)
+        except Exception as exc:  # noqa: BLE001 – one bad job must not stop the batch
+            error = f"{type(exc).__name__}: {exc}"
+        seconds = time.perf_counter() - start
+        with lock:
+            state["running"] -= 1
+            state["done"] += 1
+            status = "✗" if error else "✓"
+            print(
+                f"{status} [{state['done']}/{len(jobs)} done, {state['queued']} queued, "
+                f"{state['running']} running] {job['output_video']} {seconds:.2f}s"
+                + (f" – {error}" if error else "")
+            )
+        return {"output": job["output_video"], "seconds": seconds, "error": error}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(run_one, jobs))
+
+
+def render_text_to_video(
+    cfg: dict,
+    sentence: str,
+    phrase: str,
+    render_cfg: dict,
+    variant: str | None = None,
+    *,
+    force: bool = False,
+) -> None:
+    """Render *sentence* in memory and encode it without an intermediate file."""
+    import pango_feature_demos as pfd  # heavy gi/cairo import only for this mode
+
+    if render_cfg.get("video_config"):
+        # Unified config: render at the size of the video being encoded.
+        render_cfg = {**render_cfg, **pfd.video_canvas(cfg)}
+    settings = pfd.Settings.from_config(render_cfg)
+    variants = pfd.build_variants(render_cfg.get("variants"), settings)
+    if variant is not None:
+        variants = [v for v in variants if v[0] == variant]
+        if not variants:
+            raise ValueError(f"unknown variant: {variant}")
+    _, extra_attrs, color = variants[0]
+    markup = pfd.make_markup(sentence, phrase, extra_attrs=extra_attrs, highlight_color=color, settings=settings)
+    raster = pfd.render_raster(markup, settings=settings)
+    encode(cfg, raster.data, raster.width, raster.height, raster.pix_fmt, force=force)
+
+
 def main() -> None:
+    ap = argparse.ArgumentParser(description="PNG → transparent video via ffmpeg")
+    ap.add_argument("--sentence", help="render this sentence in memory instead of reading png_path")
+    ap.add_argument("--highlight", help="phrase to highlight (with --sentence)")
+    ap.add_argument("--variant", help="variant suffix to render (default: first configured)")
+    ap.add_argument("--render-config", default=str(ROOT / "config.yml"), help="pango_feature_demos YAML config")
+    ap.add_argument("--force", action="store_true", help="encode even if the output is up to date")
+    ap.add_argument("--batch", help="manifest of PNG paths / JSON job objects to encode in parallel")
+    ap.add_argument("--jobs", type=int, help="concurrent ffmpeg processes for --batch (default: cores / 4)")
+    ap.add_argument("--preset", choices=PRESET_NAMES, help="encoder speed preset (overrides config_video.yml)")
+    ap.add_argument("--trace", help="write a Chrome trace of every stage to this JSON file")
+    args = ap.parse_args()
+    if args.trace:
+        tracing.enable()
+
     if not CONFIG_PATH.exists():
         print(f"Config file {CONFIG_PATH} not found.", file=sys.stderr)
         sys.exit(1)
 
-    with open(CONFIG_PATH, "r", encoding="utf-8") as f:
+    with span("config.load"), open(CONFIG_PATH, "r", encoding="utf-8") as f:
         cfg = yaml.safe_load(f)
+    if args.preset:
+        cfg["preset"] = args.preset
 
-    cmd = build_ffmpeg_command(cfg)
-    run_cmd(cmd)
+    if args.batch:
+        results = run_jobs(read_batch(Path(args.batch), cfg), args.jobs, force=args.force)
+        failed = [r for r in results if r["error"]]
+        total = sum(r["seconds"] for r in results)  # type: ignore[misc]
+        print(f"\n{len(results) - len(failed)}/{len(results)} videos encoded ({total:.1f}s of encode time)")
+        tracing.finish(args.trace)
+        sys.exit(1 if failed else 0)
+    elif args.sentence or args.highlight:
+        if not (args.sentence and args.highlight):
+            ap.error("--sentence and --highlight must be given together")
+        with span("config.load"), open(args.render_config, "r", encoding="utf-8") as f:
+            render_cfg = yaml.safe_load(f) or {}
+        render_text_to_video(cfg, args.sentence, args.highlight, render_cfg, args.variant, force=args.force)
+    else:
+        encode_png(cfg, force=args.force)
     print("\n✅ Video generated at:", cfg["output_video"])
+    tracing.finish(args.trace)
 
 
 if __name__ == "__main__":